@@ -0,0 +1,35 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
+from django.utils.module_loading import autodiscover_modules
+
+from .compat import get_model, get_user_model
+from .settings import api_settings
+
+
+class ResticusConfig(AppConfig):
+    name = "resticus"
+    default_auto_field = "django.db.models.AutoField"
+
+    def ready(self):
+        from .cache import token_changed, user_changed
+        from .views import watch_cached_endpoints
+
+        # Invalidate cached credentials when users or tokens change.
+        User = get_user_model()
+        for signal in (post_save, post_delete):
+            signal.connect(user_changed, sender=User, dispatch_uid="resticus.user")
+
+        if api_settings.TOKEN_MODEL is not None:
+            Token = get_model(api_settings.TOKEN_MODEL)
+            for signal in (post_save, post_delete):
+                signal.connect(
+                    token_changed, sender=Token, dispatch_uid="resticus.token"
+                )
+
+        # Invalidate cached responses when the models they show change.
+        # Endpoints imported later are watched when the URLconf creates their
+        # views; RESPONSE_CACHE_MODULES imports them up front for processes
+        # (e.g. task workers) which never load the URLconf.
+        if api_settings.RESPONSE_CACHE_MODULES:
+            autodiscover_modules(*api_settings.RESPONSE_CACHE_MODULES)
+        watch_cached_endpoints()
@@ -8,12 +8,20 @@ from django.utils.encoding import DjangoUnicodeDecodeError
 from django.utils.translation import gettext as _
 
 from . import exceptions
+from .cache import get_credential_cache
 from .compat import get_model, get_user_model, smart_text
 from .http import HTTP_HEADER_ENCODING, Http200
 from .settings import api_settings
+from .utils import call_async
 
 
-__all__ = ["SessionAuth", "BasicHttpAuth", "SessionAuthEndpoint", "login_required"]
+__all__ = [
+    "SessionAuth",
+    "BasicHttpAuth",
+    "HashedTokenAuth",
+    "SessionAuthEndpoint",
+    "login_required",
+]
 
 
 def get_authorization_header(request):
@@ -35,9 +43,19 @@ class CSRFCheck(CsrfViewMiddleware):
 
 
 class BaseAuth(object):
+    # Authenticators are shared between requests unless they keep state.
+    stateful = False
+
     def authenticate(self, request):
         pass
 
+    async def aauthenticate(self, request):
+        """
+        Async version of authenticate(), used by AsyncEndpoint. Runs
+        authenticate() in a thread, unless it's a coroutine function.
+        """
+        return await call_async(self.authenticate, request)
+
     def authenticate_header(self, request):
         pass
 
@@ -92,14 +110,30 @@ class BasicHttpAuth(BaseAuth):
         userid, password = auth_parts[0], auth_parts[2]
         return self.authenticate_credentials(request, userid, password)
 
+    def get_cache(self):
+        """
+        Returns the CredentialCache of verified credentials, or None.
+        """
+        return get_credential_cache(api_settings.BASIC_AUTH_CACHE)
+
     def authenticate_credentials(self, request, userid, password):
         username_field = getattr(get_user_model(), "USERNAME_FIELD", "username")
         credentials = {username_field: userid, "password": password}
 
-        user = auth.authenticate(**credentials)
+        # Hashing the password is slow by design, so skip it for credentials
+        # that were recently verified.
+        cache = self.get_cache()
+        cache_key = "{0}:{1}:{2}".format(len(userid), userid, password)
+        user = cache.get("basic", cache_key) if cache is not None else None
 
         if user is None:
-            raise exceptions.AuthenticationFailed(_("Invalid username/password."))
+            user = auth.authenticate(**credentials)
+
+            if user is None:
+                raise exceptions.AuthenticationFailed(_("Invalid username/password."))
+
+            if cache is not None and user.is_active:
+                cache.set("basic", cache_key, user)
 
         if not user.is_active:
             raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
@@ -136,14 +170,32 @@ class TokenAuth(BaseAuth):
             raise ImproperlyConfigured(msg)
         return get_model(api_settings.TOKEN_MODEL)
 
+    def get_cache(self):
+        """
+        Returns the CredentialCache to look tokens up in, or None.
+        """
+        return get_credential_cache(api_settings.TOKEN_CACHE)
+
     def lookup_user(self, request, key):
         User = get_user_model()
         encoding = request.encoding or settings.DEFAULT_CHARSET
+        key = key.decode(encoding)
+
+        cache = self.get_cache()
+        if cache is not None:
+            user = cache.get("token", key)
+            if user is not None:
+                return user
+
         try:
-            return User.objects.get(api_token__key=key.decode(encoding))
+            user = User.objects.get(api_token__key=key)
         except User.DoesNotExist:
             raise exceptions.AuthenticationFailed(_("Invalid token."))
 
+        if cache is not None:
+            cache.set("token", key, user)
+        return user
+
     def authenticate_credentials(self, request, key):
         user = self.lookup_user(request, key)
 
@@ -156,6 +208,28 @@ class TokenAuth(BaseAuth):
         return "Token"
 
 
+class HashedTokenAuth(TokenAuth):
+    """
+    Token authentication against hashed, optionally expiring tokens (see
+    :py:class:`resticus.models.BaseHashedToken`), that records when they
+    were last used.
+    """
+
+    @staticmethod
+    def get_token_model():
+        return get_model(api_settings.HASHED_TOKEN_MODEL)
+
+    def lookup_user(self, request, key):
+        encoding = request.encoding or settings.DEFAULT_CHARSET
+        token = self.get_token_model().lookup(key.decode(encoding))
+
+        if token is None or token.is_expired():
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+        token.record_usage()
+        return token.get_user()
+
+
 def login_required(fn):
     """
     Decorator for :py:class:`resticus.views.Endpoint` methods to require
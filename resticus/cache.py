@@ -0,0 +1,398 @@
+import hashlib
+import hmac
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.http import HttpResponse
+from django.test.signals import setting_changed
+from django.utils.encoding import force_bytes
+
+from .compat import get_user_model
+from .settings import api_settings
+
+__all__ = [
+    "LocalCache",
+    "CredentialCache",
+    "ResponseCache",
+    "get_credential_cache",
+    "get_response_cache",
+    "invalidate_model",
+    "invalidate_user",
+    "watch_models",
+]
+
+
+class LocalCache(object):
+    """
+    A thread-safe, in-process LRU cache of up to ``max_size`` entries, which
+    expire ``timeout`` seconds after they're set.
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                expires, value = self.entries[key]
+            except KeyError:
+                return default
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return default
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def discard(self, predicate):
+        """Delete the entries whose values match ``predicate``."""
+        with self.lock:
+            for key, (expires, value) in list(self.entries.items()):
+                if predicate(value):
+                    del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class CredentialCache(object):
+    """
+    Caches the users that credentials (API tokens, or usernames and
+    passwords) were verified for, in a LocalCache in front of the Django
+    cache named ``alias``. Credentials are only ever stored as keyed (HMAC)
+    digests, and users as their pk and ``user_fields``; other fields are
+    loaded from the database when they're first accessed.
+
+    Each entry records the user's generation, which is checked against the
+    shared cache on every hit, including hits of the local tier, and stops
+    matching once invalidate_user() changes it. That happens whenever the
+    user is saved or deleted; QuerySet.update() doesn't send signals, so
+    call invalidate_user() after updating users in bulk.
+    """
+
+    key_prefix = "resticus"
+    # The fields that authentication checks read.
+    user_fields = ("is_active", "last_login")
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.local = None
+        if api_settings.CREDENTIAL_CACHE_LOCAL_SIZE:
+            self.local = LocalCache(
+                api_settings.CREDENTIAL_CACHE_LOCAL_SIZE,
+                api_settings.CREDENTIAL_CACHE_LOCAL_TIMEOUT,
+            )
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, namespace, credentials):
+        digest = hmac.new(
+            force_bytes(settings.SECRET_KEY), force_bytes(credentials), hashlib.sha256
+        ).hexdigest()
+        return "{0}:{1}:{2}".format(self.key_prefix, namespace, digest)
+
+    def make_generation_key(self, pk):
+        return "{0}:user:{1}".format(self.key_prefix, pk)
+
+    def get_user_fields(self, model):
+        names = set(self.user_fields)
+        names.add(getattr(model, "USERNAME_FIELD", "username"))
+        return [
+            field
+            for field in model._meta.concrete_fields
+            if field.primary_key or field.name in names
+        ]
+
+    def dump_user(self, user):
+        return {
+            field.attname: getattr(user, field.attname)
+            for field in self.get_user_fields(type(user))
+        }
+
+    def load_user(self, values):
+        User = get_user_model()
+        field_names = [field.attname for field in self.get_user_fields(User)]
+        return User.from_db(
+            router.db_for_read(User),
+            field_names,
+            [values[name] for name in field_names],
+        )
+
+    def get(self, namespace, credentials):
+        """
+        Returns the user the credentials were verified for, or None.
+        """
+        key = self.make_key(namespace, credentials)
+        entry = self.local.get(key) if self.local is not None else None
+        if entry is None:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            if self.local is not None:
+                self.local.set(key, entry)
+
+        pk, values, generation = entry
+        if self.cache.get(self.make_generation_key(pk)) != generation:
+            if self.local is not None:
+                self.local.delete(key)
+            return None
+        try:
+            return self.load_user(values)
+        except KeyError:
+            # Cached with other user_fields.
+            return None
+
+    def set(self, namespace, credentials, user):
+        generation_key = self.make_generation_key(user.pk)
+        # Entries of users without a generation never match, in case it was
+        # evicted after an invalidation, so make sure there is one.
+        self.cache.add(generation_key, uuid.uuid4().hex, timeout=None)
+        generation = self.cache.get(generation_key)
+
+        key = self.make_key(namespace, credentials)
+        entry = (user.pk, self.dump_user(user), generation)
+        self.cache.set(key, entry, api_settings.CREDENTIAL_CACHE_TIMEOUT)
+        if self.local is not None:
+            self.local.set(key, entry)
+
+    def delete(self, namespace, credentials):
+        key = self.make_key(namespace, credentials)
+        self.cache.delete(key)
+        if self.local is not None:
+            self.local.delete(key)
+
+    def invalidate_user(self, pk):
+        self.cache.set(self.make_generation_key(pk), uuid.uuid4().hex, timeout=None)
+        if self.local is not None:
+            self.local.discard(lambda entry: entry[0] == pk)
+
+
+_credential_caches = {}
+
+
+def get_credential_cache(alias):
+    """
+    Returns the CredentialCache backed by the cache ``alias``, or None if the
+    alias is None (caching is disabled).
+    """
+    if alias is None:
+        return None
+    try:
+        return _credential_caches[alias]
+    except KeyError:
+        return _credential_caches.setdefault(alias, CredentialCache(alias))
+
+
+def get_credential_caches():
+    aliases = {api_settings.TOKEN_CACHE, api_settings.BASIC_AUTH_CACHE}
+    return [get_credential_cache(alias) for alias in aliases if alias is not None]
+
+
+def invalidate_user(pk):
+    for cache in get_credential_caches():
+        cache.invalidate_user(pk)
+
+
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        # Logging in doesn't change which credentials are valid.
+        return
+    invalidate_user(instance.pk)
+
+
+def token_changed(sender, instance, **kwargs):
+    cache = get_credential_cache(api_settings.TOKEN_CACHE)
+    if cache is not None:
+        cache.delete("token", instance.key)
+    # Other processes' local tiers only notice through the user's generation
+    # (and the token's previous key may be cached too).
+    invalidate_user(instance.user_id)
+
+
+class ResponseCache(object):
+    """
+    Caches the encoded (status, headers and body) GET and HEAD responses of
+    endpoints in the Django cache named ``alias``.
+
+    Response keys include a version for each model the response was built
+    from. Saving or deleting an instance of a model bumps its version, so
+    the entries that depend on it stop matching, and expire, without
+    having to find and delete them.
+    """
+
+    key_prefix = "resticus"
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_version_key(self, model):
+        label = model._meta.concrete_model._meta.label_lower
+        return "{0}:version:{1}".format(self.key_prefix, label)
+
+    def get_versions(self, models):
+        keys = [self.make_version_key(model) for model in models]
+        versions = self.cache.get_many(keys) if keys else {}
+        for key in keys:
+            if key not in versions:
+                self.cache.add(key, uuid.uuid4().hex, timeout=None)
+                versions[key] = self.cache.get(key)
+        return [versions[key] for key in keys]
+
+    def make_key(self, method, path, params, scope, models, variant=""):
+        """
+        Returns the key of the response to a ``method`` (GET or HEAD) request
+        to ``path`` with the query ``params`` (a QueryDict), for the user
+        ``scope``, in the format (media type) ``variant``.
+        """
+        versions = self.get_versions(models)
+        signature = repr(
+            (method, path, sorted(params.lists()), scope, variant, versions)
+        )
+        digest = hashlib.sha256(force_bytes(signature)).hexdigest()
+        return "{0}:response:{1}".format(self.key_prefix, digest)
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+
+        status, headers, content = entry
+        response = HttpResponse(content, status=status)
+        for header, value in headers:
+            response[header] = value
+        return response
+
+    def set(self, key, response, timeout):
+        """
+        Caches the response, and returns it. The content of streaming
+        responses is cached once it's all been streamed, unless there's
+        more than ``RESPONSE_CACHE_MAX_SIZE`` bytes of it.
+        """
+        entry = (response.status_code, list(response.items()))
+        if response.streaming:
+            response.streaming_content = self.stream(
+                key, response.streaming_content, entry, timeout
+            )
+        elif not self.is_too_large(len(response.content)):
+            self.cache.set(key, entry + (response.content,), timeout)
+        return response
+
+    def stream(self, key, content, entry, timeout):
+        chunks, size = [], 0
+        for chunk in content:
+            if chunks is not None:
+                size += len(chunk)
+                if self.is_too_large(size):
+                    chunks = None
+                else:
+                    chunks.append(chunk)
+            yield chunk
+        if chunks is not None:
+            self.cache.set(key, entry + (b"".join(chunks),), timeout)
+
+    def is_too_large(self, size):
+        max_size = api_settings.RESPONSE_CACHE_MAX_SIZE
+        return max_size is not None and size > max_size
+
+    def invalidate_model(self, model):
+        self.cache.set(self.make_version_key(model), uuid.uuid4().hex, timeout=None)
+
+
+_response_caches = {}
+# Cache aliases to invalidate, by (concrete) model.
+_watched_models = {}
+
+
+def get_response_cache(alias):
+    try:
+        return _response_caches[alias]
+    except KeyError:
+        return _response_caches.setdefault(alias, ResponseCache(alias))
+
+
+def watch_models(models, alias):
+    """
+    Invalidate the responses cached in ``alias`` when instances of any of
+    the ``models`` change.
+    """
+    for model in models:
+        model = model._meta.concrete_model
+        if model not in _watched_models:
+            connect_signals(model)
+        _watched_models.setdefault(model, set()).add(alias)
+
+
+def connect_signals(model):
+    """
+    Connects the receivers invalidating cached responses for ``model``, its
+    proxies and its many-to-many relations. They're connected per sender,
+    as receivers of any sender keep Collector.can_fast_delete() from
+    deleting the instances of any model in bulk.
+    """
+    uid = "resticus.responses"
+    for sender in apps.get_models():
+        if sender._meta.concrete_model is model:
+            post_save.connect(model_changed, sender=sender, dispatch_uid=uid)
+            post_delete.connect(model_changed, sender=sender, dispatch_uid=uid)
+    for field in model._meta.get_fields(include_hidden=True):
+        if field.many_to_many:
+            through = (
+                field.through if field.auto_created else field.remote_field.through
+            )
+            m2m_changed.connect(relations_changed, sender=through, dispatch_uid=uid)
+
+
+def invalidate_model(model):
+    """
+    Invalidate the cached responses built from instances of ``model``, e.g.
+    after updating them without sending signals (QuerySet.update(),
+    bulk_create() or bulk_update()).
+    """
+    for alias in _watched_models.get(model._meta.concrete_model, ()):
+        get_response_cache(alias).invalidate_model(model)
+
+
+def model_changed(sender, **kwargs):
+    invalidate_model(sender)
+
+
+def relations_changed(sender, instance, action, model, **kwargs):
+    if action.startswith("post_"):
+        for changed in {sender, type(instance), model}:
+            invalidate_model(changed)
+
+
+def reset_caches(*args, **kwargs):
+    if kwargs["setting"] in ("RESTICUS", "CACHES", "SECRET_KEY"):
+        _credential_caches.clear()
+        _response_caches.clear()
+
+
+setting_changed.connect(reset_caches)
@@ -1,3 +1,6 @@
+import asyncio
+
+import django
 from django.conf import settings
 
 try:
@@ -41,3 +44,18 @@ def get_model(model_lookup):
         from django.db import models
 
         return models.get_model(app_label, model_name)
+
+
+# QuerySet.iterator() honors prefetch_related() lookups since Django 4.1.
+ITERATOR_PREFETCHES = django.VERSION >= (4, 1)
+
+# StreamingHttpResponse accepts async iterators since Django 4.2.
+ASYNC_STREAMING = django.VERSION >= (4, 2)
+
+try:
+    from asgiref.sync import markcoroutinefunction
+except ImportError:
+    # asgiref < 3.6
+    def markcoroutinefunction(func):
+        func._is_coroutine = asyncio.coroutines._is_coroutine
+        return func
@@ -0,0 +1,198 @@
+import zlib
+
+from django.utils.cache import patch_vary_headers
+
+from .settings import api_settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+__all__ = [
+    "GzipCompressor",
+    "BrotliCompressor",
+    "ZstdCompressor",
+    "get_compressors",
+    "negotiate_encoding",
+    "compress_response",
+]
+
+
+class GzipCompressor(object):
+    """
+    Incremental compressors take content with compress(), and return what's
+    ready of the compressed output. flush() returns the rest of the output
+    so far, so that clients can decode everything sent, and finish() ends
+    the stream.
+    """
+
+    default_level = 6
+
+    def __init__(self, level=None):
+        if level is None:
+            level = self.default_level
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor(object):
+    default_level = 4
+
+    def __init__(self, level=None):
+        if level is None:
+            level = self.default_level
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class ZstdCompressor(object):
+    default_level = 3
+
+    def __init__(self, level=None):
+        if level is None:
+            level = self.default_level
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def get_compressors():
+    """
+    Returns the compressor classes of the available content codings, by
+    name, in order of preference (the COMPRESSION_ENCODINGS setting).
+    """
+    available = {"gzip": GzipCompressor}
+    if brotli is not None:
+        available["br"] = BrotliCompressor
+    if zstandard is not None:
+        available["zstd"] = ZstdCompressor
+    return {
+        name: available[name]
+        for name in api_settings.COMPRESSION_ENCODINGS
+        if name in available
+    }
+
+
+def negotiate_encoding(accept_encoding, encodings):
+    """
+    Returns the first of ``encodings`` that the Accept-Encoding header
+    value accepts (with a non-zero quality), or None.
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def is_compressible(response):
+    content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+    return response.status_code not in (204, 304) and any(
+        content_type.startswith(prefix) for prefix in api_settings.COMPRESSIBLE_TYPES
+    )
+
+
+def compress_chunks(chunks, compressor):
+    # Each chunk (coalesced to STREAMING_BUFFER_SIZE) is compressed as soon
+    # as it's encoded, and flushed, so clients get a steady stream.
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_chunks(chunks, compressor):
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def compress_response(request, response):
+    """
+    Compresses the response body with the preferred content coding that
+    the request accepts. Streamed bodies are compressed incrementally;
+    others only if they're at least COMPRESSION_MIN_SIZE bytes long.
+    """
+    if response.has_header("Content-Encoding") or not is_compressible(response):
+        return response
+
+    patch_vary_headers(response, ("Accept-Encoding",))
+    if not response.streaming and len(response.content) < (
+        api_settings.COMPRESSION_MIN_SIZE
+    ):
+        return response
+
+    compressors = get_compressors()
+    encoding = negotiate_encoding(
+        request.META.get("HTTP_ACCEPT_ENCODING", ""), compressors
+    )
+    if encoding is None:
+        return response
+
+    compressor = compressors[encoding](api_settings.COMPRESSION_LEVELS.get(encoding))
+    if not response.streaming:
+        content = compressor.compress(response.content) + compressor.finish()
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response["Content-Length"] = str(len(content))
+    elif getattr(response, "is_async", False):
+        response.streaming_content = acompress_chunks(
+            response.streaming_content, compressor
+        )
+    else:
+        response.streaming_content = compress_chunks(
+            response.streaming_content, compressor
+        )
+
+    # The compressed representation isn't byte-for-byte the same.
+    etag = response.get("ETag")
+    if etag and etag.startswith('"'):
+        response["ETag"] = "W/" + etag
+    response["Content-Encoding"] = encoding
+    return response
@@ -1,13 +1,47 @@
+import itertools
+import re
+import secrets
 import warnings
 
 from django.core.serializers.json import DjangoJSONEncoder
-from django.utils.encoding import force_text
+from django.utils.encoding import force_bytes, force_text
 import types
 
 from django.utils.functional import Promise
 
 from .compat import json
-from .iterators import iterlist
+from .iterators import iterdict, iterlist
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+__all__ = ["JSONDecoder", "JSONEncoder", "ORJSONEncoder", "RawJSON"]
+
+# Encoders stand in a placeholder string for each RawJSON value, and swap
+# the (encoded) placeholders for the raw JSON in their output. Placeholders
+# hold a random nonce per encoder, so data can't forge them.
+RAW_JSON_PLACEHOLDER = "\x00rawjson:{0}:{1}\x00"
+RAW_JSON_PATTERN = r'"\\u0000rawjson:([0-9a-f]+):(\d+)\\u0000"'
+RAW_JSON_REGEX = re.compile(RAW_JSON_PATTERN)
+RAW_JSON_BYTES_REGEX = re.compile(RAW_JSON_PATTERN.encode("ascii"))
+
+
+class RawJSON(object):
+    """
+    Already encoded JSON (str or bytes), such as a cached serialized
+    object, that the JSON encoders write out verbatim instead of encoding.
+    The value isn't validated.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        self.value = value
 
 
 class JSONDecoder(json.JSONDecoder):
@@ -15,7 +49,151 @@ class JSONDecoder(json.JSONDecoder):
 
 
 class JSONEncoder(DjangoJSONEncoder):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.raw_json = {}
+        self.raw_json_ids = itertools.count()
+        self.raw_json_nonce = secrets.token_hex(8)
+
     def default(self, obj):
         if isinstance(obj, types.GeneratorType):
             return iterlist(obj)
+        elif isinstance(obj, RawJSON):
+            key = next(self.raw_json_ids)
+            self.raw_json[key] = obj.value
+            return RAW_JSON_PLACEHOLDER.format(self.raw_json_nonce, key)
         return super().default(obj)
+
+    def splice_raw_json(self, encoded):
+        """Replace RawJSON placeholders in encoded output (str or bytes)."""
+        if not self.raw_json:
+            return encoded
+        if isinstance(encoded, bytes):
+            return RAW_JSON_BYTES_REGEX.sub(self._pop_raw_json, encoded)
+        return RAW_JSON_REGEX.sub(
+            lambda match: self._pop_raw_json(match).decode("utf-8"), encoded
+        )
+
+    def _pop_raw_json(self, match):
+        value = None
+        if force_text(match.group(1)) == self.raw_json_nonce:
+            value = self.raw_json.pop(int(match.group(2)), None)
+        if value is None:
+            # Not one of ours (anymore), so it's left as it is.
+            return force_bytes(match.group(0))
+        return value
+
+    # encode() goes through iterencode(), which splices the raw JSON.
+
+    def iterencode(self, o, _one_shot=False):
+        # Every placeholder is yielded whole, as a single string value.
+        for chunk in super().iterencode(o, _one_shot):
+            yield self.splice_raw_json(chunk)
+
+    def encode_bytes(self, o):
+        """Return the UTF-8 encoded JSON representation of ``o``."""
+        return self.encode(o).encode("utf-8")
+
+
+class ORJSONEncoder(JSONEncoder):
+    """
+    JSON encoder backed by orjson, if it's installed, that writes bytes
+    directly. Types that orjson would encode differently from JSONEncoder
+    (datetimes, and subclasses of builtin types such as iterlist) are passed
+    through to JSONEncoder.default(), so the output is the same, minus
+    the whitespace. Without orjson, it behaves exactly like JSONEncoder.
+    """
+
+    if orjson is not None:
+        options = (
+            orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_SUBCLASS
+        )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Lazy values consumed by the current orjson call, by id, kept to
+        # encode them again if it fails.
+        self.materialized = {}
+
+    def orjson_default(self, obj):
+        if isinstance(obj, dict):
+            return self.materialize(obj, dict(obj.items()))
+        elif isinstance(obj, (list, types.GeneratorType)):
+            return self.materialize(obj, list(obj))
+        elif isinstance(obj, str):
+            return str(obj)
+        elif isinstance(obj, int):
+            return int(obj)
+        elif isinstance(obj, RawJSON) and hasattr(orjson, "Fragment"):
+            return orjson.Fragment(obj.value)
+        return self.default(obj)
+
+    def encode(self, o):
+        if orjson is None:
+            return super().encode(o)
+        return self.encode_bytes(o).decode("utf-8")
+
+    def encode_bytes(self, o):
+        if orjson is None:
+            return super().encode_bytes(o)
+        try:
+            encoded = orjson.dumps(o, default=self.orjson_default, option=self.options)
+            return self.splice_raw_json(encoded)
+        except orjson.JSONEncodeError:
+            # orjson is stricter than the json module, e.g. about integers
+            # that don't fit in 64 bits.
+            return super().encode(self.restore(o)).encode("utf-8")
+        finally:
+            self.materialized.clear()
+
+    def materialize(self, obj, value):
+        if self.is_lazy(obj):
+            self.materialized[id(obj)] = (obj, value)
+        return value
+
+    def restore(self, value):
+        """
+        Return ``value`` with the lazy values that a failed orjson call
+        consumed replaced by their items.
+        """
+        if id(value) in self.materialized:
+            value = self.materialized[id(value)][1]
+        if isinstance(value, dict) and not self.is_lazy(value):
+            return {key: self.restore(item) for key, item in value.items()}
+        elif isinstance(value, (list, tuple)) and not self.is_lazy(value):
+            return [self.restore(item) for item in value]
+        return value
+
+    def iterencode(self, o, _one_shot=False):
+        if orjson is None or _one_shot:
+            # JSONEncoder.encode() goes through here with _one_shot set.
+            yield from super().iterencode(o, _one_shot)
+            return
+
+        # Only containers holding lazy values are encoded piece by piece, so
+        # each row of a streamed list is still encoded in a single call.
+        if isinstance(o, dict) and (
+            isinstance(o, iterdict) or any(map(self.is_lazy, o.values()))
+        ):
+            yield b"{"
+            for index, (key, value) in enumerate(o.items()):
+                if not isinstance(key, str):
+                    key = self.encode_bytes(key).decode("utf-8")
+                yield (b"," if index else b"") + orjson.dumps(key) + b":"
+                yield from self.iterencode(value)
+            yield b"}"
+        elif self.is_lazy(o):
+            yield b"["
+            for index, item in enumerate(o if o else ()):
+                if index:
+                    yield b","
+                yield from self.iterencode(item)
+            yield b"]"
+        else:
+            yield self.encode_bytes(o)
+
+    @staticmethod
+    def is_lazy(value):
+        return isinstance(value, (types.GeneratorType, iterlist, iterdict))
@@ -58,3 +58,20 @@ class ValidationError(APIException):
     def __init__(self, form, **kwargs):
         errors = {"errors": form.errors.get_json_data()}
         super(ValidationError, self).__init__(errors, **kwargs)
+
+
+class BulkValidationError(APIException):
+    response_class = http.Http400
+    default_reason = _("Malformed request.")
+
+    def __init__(self, errors, **kwargs):
+        """
+        ``errors`` maps the index of each invalid item to its (bound) form,
+        or to a dict of errors in the same format.
+        """
+        data = {}
+        for index, error in errors.items():
+            if hasattr(error, "errors"):
+                error = error.errors.get_json_data()
+            data[str(index)] = error
+        super(BulkValidationError, self).__init__({"errors": data}, **kwargs)
@@ -5,6 +5,8 @@ from django.contrib.gis.db.models.fields import BaseSpatialField
 from django_filters.constants import ALL_FIELDS
 from django_filters import Filter, FilterSet as BaseFilterSet
 
+from .utils import memoize_factory
+
 
 # Geospatial filter functionality adapted from
 # drf-gis and updated for django-filters 2.x.
@@ -31,6 +33,7 @@ class FilterSet(BaseFilterSet):
     FILTER_DEFAULTS.update(GIS_FILTER_DEFAULTS)
 
 
+@memoize_factory
 def filterset_factory(model, fields=ALL_FIELDS):
     meta = type("Meta", (object,), {"model": model, "fields": fields})
     filterset = type(
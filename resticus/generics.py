@@ -1,13 +1,20 @@
+import hashlib
+from collections.abc import Iterator
+
 from django.core import paginator
 from django.core.exceptions import ImproperlyConfigured
-from django.forms.models import modelform_factory
+from django.db.models import Count, IntegerField, Max, Sum
+from django.db.models.constants import LOOKUP_SEP
 from django.utils.translation import gettext as _
 
 from . import exceptions, http, mixins
-from .serializers import Serializer
+from .iterators import prime
+from .pagination import CursorPaginator, InvalidCursor, Paginator
+from .renderers import TabularRenderer
+from .serializers import Serializer, compile_plan
 from .settings import api_settings
-from .utils import filterset_factory
-from .views import Endpoint
+from .utils import filterset_factory, modelform_factory
+from .views import AsyncEndpoint, Endpoint
 
 __all__ = [
     "GenericEndpoint",
@@ -20,14 +27,44 @@ __all__ = [
     "DetailUpdateEndpoint",
     "DetailDeleteEndpoint",
     "DetailUpdateDeleteEndpoint",
+    "BulkCreateEndpoint",
+    "BulkUpdateEndpoint",
+    "BulkDeleteEndpoint",
+    "AsyncGenericEndpoint",
+    "AsyncCreateEndpoint",
+    "AsyncListEndpoint",
+    "AsyncDetailEndpoint",
+    "AsyncUpdateEndpoint",
+    "AsyncDeleteEndpoint",
+    "AsyncListCreateEndpoint",
+    "AsyncDetailUpdateEndpoint",
+    "AsyncDetailDeleteEndpoint",
+    "AsyncDetailUpdateDeleteEndpoint",
 ]
 
 
+def _is_selected(select_related, name):
+    """
+    Whether the ``name`` lookup (e.g. ``author__publisher``) is in the nested
+    dict of a query's select_related.
+    """
+    for part in name.split(LOOKUP_SEP):
+        if part not in select_related:
+            return False
+        select_related = select_related[part]
+    return True
+
+
 class GenericEndpoint(Endpoint):
     model = None
 
     serializer_class = Serializer
     fields = None
+    fast_values = False
+    optimize_related = True
+    # Defer the columns the field spec doesn't read. Off by default, as
+    # overridden hooks that read other columns would load them per row.
+    optimize_columns = False
 
     lookup_field = "pk"
     lookup_url_kwarg = None
@@ -41,6 +78,24 @@ class GenericEndpoint(Endpoint):
     page_query_param = api_settings.PAGE_QUERY_PARAM
     page_size_query_param = api_settings.PAGE_SIZE_QUERY_PARAM
     max_page_size = api_settings.MAX_PAGE_SIZE
+    count_strategy = api_settings.PAGE_COUNT
+    count_cache_timeout = api_settings.PAGE_COUNT_CACHE_TIMEOUT
+    count_estimate_threshold = api_settings.PAGE_COUNT_ESTIMATE_THRESHOLD
+    # Set to e.g. ("pk",) or ("-created", "pk") to paginate by cursor.
+    cursor_ordering = None
+    cursor_query_param = api_settings.CURSOR_QUERY_PARAM
+
+    # Serialize streamed QuerySets lazily, chunk_size rows at a time, as
+    # the response is written. Only the first chunk is fetched before the
+    # response is returned, so later database errors truncate it, and
+    # (before Django 4.2) the rest is fetched in the event loop on ASGI.
+    lazy_streaming = False
+    chunk_size = api_settings.STREAMING_CHUNK_SIZE
+
+    # Fields to derive the validators of conditional GETs from: a version
+    # number incremented on every save, and/or a last modification time.
+    etag_field = None
+    last_modified_field = None
 
     def get_queryset(self):
         if self.queryset is not None:
@@ -56,7 +111,11 @@ class GenericEndpoint(Endpoint):
         raise ImproperlyConfigured(msg.format(self.__class__.__name__))
 
     def get_object(self):
-        queryset = self.filter_queryset(self.get_queryset())
+        queryset = self.get_queryset()
+        if self.request.method in ("GET", "HEAD"):
+            # Objects fetched to be shown load what serializing them reads.
+            queryset = self.optimize_queryset(queryset)
+        queryset = self.filter_queryset(queryset)
 
         lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
         try:
@@ -86,17 +145,150 @@ class GenericEndpoint(Endpoint):
             return filter.qs
         return queryset
 
+    def optimize_queryset(self, queryset):
+        """
+        Apply the select_related/prefetch_related lookups needed to serialize
+        the queryset with this endpoint's field spec, and defer the columns
+        it doesn't read.
+        """
+        if queryset._fields is not None:
+            # values() querysets don't load model instances.
+            return queryset
+
+        plan = self.get_serialization_plan(queryset.model)
+        optimize_columns = (
+            self.optimize_columns
+            and self.get_serializer_class().is_declarative()
+            # Overridden serialize() methods may read other columns.
+            and type(self).serialize is GenericEndpoint.serialize
+            # Respect deferred loading set up by get_queryset().
+            and queryset.query.deferred_loading == (frozenset(), True)
+        )
+
+        if self.optimize_related:
+            select, prefetch = plan.related_lookups(only=optimize_columns)
+            # Keep the lookups get_queryset() set up, e.g. filtered Prefetches.
+            selected = queryset.query.select_related
+            if selected is True:
+                select = []
+            elif selected:
+                select = [name for name in select if not _is_selected(selected, name)]
+            prefetched = set()
+            for lookup in queryset._prefetch_related_lookups:
+                path = getattr(lookup, "prefetch_to", lookup).split(LOOKUP_SEP)
+                prefetched.update(
+                    LOOKUP_SEP.join(path[:end]) for end in range(1, len(path) + 1)
+                )
+            prefetch = [
+                lookup
+                for lookup in prefetch
+                if getattr(lookup, "prefetch_to", lookup) not in prefetched
+            ]
+            if select:
+                queryset = queryset.select_related(*select)
+            if prefetch:
+                queryset = queryset.prefetch_related(*prefetch)
+
+        if optimize_columns:
+            only = plan.only_lookups()
+            if only is not None:
+                validators = [self.etag_field, self.last_modified_field]
+                only.extend(name for name in validators if name is not None)
+                queryset = queryset.only(*only)
+        return queryset
+
+    def make_etag(self, *values):
+        signature = repr(
+            (
+                self.request.path,
+                sorted(self.request.GET.lists()),
+                self.request.renderer.media_type,
+                values,
+            )
+        )
+        return hashlib.sha1(signature.encode("utf-8")).hexdigest()
+
+    def get_object_conditional_response(self, obj):
+        """
+        Returns a 304 Not Modified response if the client has the current
+        version of the object, going by its etag_field and/or
+        last_modified_field, otherwise None.
+        """
+        etag = last_modified = None
+        if self.etag_field is not None:
+            etag = self.make_etag(getattr(obj, self.etag_field))
+        if self.last_modified_field is not None:
+            last_modified = getattr(obj, self.last_modified_field)
+        if etag is None and last_modified is None:
+            return None
+        return self.get_conditional_response(self.request, etag, last_modified)
+
+    def get_list_conditional_response(self, queryset):
+        """
+        Returns a 304 Not Modified response if the client has the current
+        version of the (filtered) list, going by the number of objects and
+        the sum of their etag_field and/or latest last_modified_field,
+        otherwise None. With only an etag_field, the sum and maximum of the
+        (integer) primary keys tell when objects are replaced by others.
+        """
+        if self.etag_field is None and self.last_modified_field is None:
+            return None
+
+        aggregates = {"count": Count("pk")}
+        if self.etag_field is not None:
+            aggregates["version"] = Sum(self.etag_field)
+            if self.last_modified_field is None:
+                pk = queryset.model._meta.pk
+                if not isinstance(getattr(pk, "target_field", pk), IntegerField):
+                    msg = _(
+                        '{0} must define "last_modified_field" for list '
+                        "validators, as its primary key isn't an integer"
+                    )
+                    raise ImproperlyConfigured(msg.format(self.__class__.__name__))
+                aggregates["pk_sum"] = Sum("pk")
+                aggregates["pk_max"] = Max("pk")
+        if self.last_modified_field is not None:
+            aggregates["last_modified"] = Max(self.last_modified_field)
+        values = queryset.aggregate(**aggregates)
+
+        etag = self.make_etag(*sorted(values.items()))
+        return self.get_conditional_response(
+            self.request, etag, values.get("last_modified")
+        )
+
+    def get_cache_models(self):
+        """
+        Returns the model, and the related models named in the field spec.
+        """
+        model = self.model
+        if model is None and self.queryset is not None:
+            model = self.queryset.model
+        if model is None:
+            return []
+        return [model, *self.get_serialization_plan(model).related_models()]
+
+    def get_page_size(self):
+        try:
+            page_size = int(self.request.GET[self.page_size_query_param])
+            return max(min(page_size, self.max_page_size), 1)
+        except (KeyError, ValueError):
+            return self.page_size
+
     def paginate_queryset(self, queryset):
         self.paginator = None
         if self.paginate:
-            try:
-                page_size = int(self.request.GET[self.page_size_query_param])
-                page_size = max(min(page_size, self.max_page_size), 1)
-            except (KeyError, ValueError):
-                page_size = self.page_size
-
-            self.paginator = paginator.Paginator(
-                object_list=queryset, per_page=page_size, allow_empty_first_page=True
+            page_size = self.get_page_size()
+
+            if self.cursor_ordering is not None:
+                return self.paginate_queryset_by_cursor(queryset, page_size)
+
+            self.paginator = Paginator(
+                object_list=queryset,
+                per_page=page_size,
+                count_strategy=self.count_strategy,
+                cache_timeout=self.count_cache_timeout,
+                estimate_threshold=self.count_estimate_threshold,
+                allow_empty_first_page=True,
             )
 
             try:
@@ -108,6 +300,16 @@ class GenericEndpoint(Endpoint):
             return self.page.object_list
         return queryset
 
+    def paginate_queryset_by_cursor(self, queryset, page_size):
+        self.paginator = CursorPaginator(queryset, self.cursor_ordering, page_size)
+        try:
+            self.page = self.paginator.page(
+                self.request.GET.get(self.cursor_query_param)
+            )
+        except InvalidCursor:
+            raise exceptions.NotFound(_("Invalid cursor."))
+        return self.page.object_list
+
     def get_form_class(self):
         if self.form_class is not None:
             return self.form_class
@@ -127,16 +329,40 @@ class GenericEndpoint(Endpoint):
     def get_serializer_class(self):
         return self.serializer_class
 
+    def get_serialization_plan(self, model):
+        SerializerClass = self.get_serializer_class()
+        return compile_plan(
+            model,
+            self.fields or SerializerClass.fields,
+            SerializerClass.include,
+            SerializerClass.exclude,
+        )
+
     def serialize(self, source, fields=None, include=None, exclude=None, fixup=None):
-        serializer = self.get_serializer_class()
-        return serializer(
+        lazy = self.streaming and self.lazy_streaming
+        SerializerClass = self.get_serializer_class()
+        serializer = SerializerClass(
             source,
             fields=fields or self.fields,
             include=include,
             exclude=exclude,
             fixup=fixup,
             request=self.request,
-        ).data
+            chunk_size=self.chunk_size if lazy else None,
+        )
+        renderer = getattr(self.request, "renderer", None)
+        if isinstance(renderer, TabularRenderer):
+            # Columns of nested objects may be missing from the first rows.
+            renderer.columns = serializer.columns()
+        data = None
+        if self.fast_values:
+            # Flat field specs can skip building model instances entirely.
+            data = serializer.values()
+        if data is None:
+            data = serializer.data
+        if lazy and isinstance(data, Iterator):
+            data = prime(data)
+        return data
 
 
 class CreateEndpoint(mixins.CreateModelMixin, GenericEndpoint):
@@ -188,3 +414,72 @@ class DetailUpdateDeleteEndpoint(
     GenericEndpoint,
 ):
     pass
+
+
+class BulkCreateEndpoint(mixins.BulkCreateModelMixin, GenericEndpoint):
+    pass
+
+
+class BulkUpdateEndpoint(mixins.BulkUpdateModelMixin, GenericEndpoint):
+    pass
+
+
+class BulkDeleteEndpoint(mixins.BulkDeleteModelMixin, GenericEndpoint):
+    pass
+
+
+class AsyncGenericEndpoint(GenericEndpoint, AsyncEndpoint):
+    pass
+
+
+class AsyncCreateEndpoint(mixins.AsyncCreateModelMixin, AsyncGenericEndpoint):
+    pass
+
+
+class AsyncListEndpoint(mixins.AsyncListModelMixin, AsyncGenericEndpoint):
+    pass
+
+
+class AsyncDetailEndpoint(mixins.AsyncDetailModelMixin, AsyncGenericEndpoint):
+    pass
+
+
+class AsyncUpdateEndpoint(
+    mixins.AsyncUpdateModelMixin, mixins.AsyncPatchModelMixin, AsyncGenericEndpoint
+):
+    pass
+
+
+class AsyncDeleteEndpoint(mixins.AsyncDeleteModelMixin, AsyncGenericEndpoint):
+    pass
+
+
+class AsyncListCreateEndpoint(
+    mixins.AsyncListModelMixin, mixins.AsyncCreateModelMixin, AsyncGenericEndpoint
+):
+    pass
+
+
+class AsyncDetailUpdateEndpoint(
+    mixins.AsyncDetailModelMixin,
+    mixins.AsyncUpdateModelMixin,
+    mixins.AsyncPatchModelMixin,
+    AsyncGenericEndpoint,
+):
+    pass
+
+
+class AsyncDetailDeleteEndpoint(
+    mixins.AsyncDetailModelMixin, mixins.AsyncDeleteModelMixin, AsyncGenericEndpoint
+):
+    pass
+
+
+class AsyncDetailUpdateDeleteEndpoint(
+    mixins.AsyncDetailModelMixin,
+    mixins.AsyncUpdateModelMixin,
+    mixins.AsyncPatchModelMixin,
+    mixins.AsyncDeleteModelMixin,
+    AsyncGenericEndpoint,
+):
+    pass
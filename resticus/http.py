@@ -5,11 +5,15 @@ from django import http
 from django.conf import settings
 from django.utils.translation import gettext as _
 
+from .compat import ASYNC_STREAMING
+from .iterators import acoalesce, coalesce, iterate_sync
 from .settings import api_settings
 
 __all__ = [
     "JSONResponse",
     "StreamingJSONResponse",
+    "RenderedResponse",
+    "StreamingRenderedResponse",
     "JSONErrorResponse",
     "Http200",
     "Http201",
@@ -26,20 +30,134 @@ __all__ = [
 HTTP_HEADER_ENCODING = "iso-8859-1"
 
 
-class JSONResponse(http.HttpResponse):
-    """An HTTP response class that consumes data to be serialized to JSON."""
+def encode_json(data, encoder=None):
+    """Encode data to JSON bytes with the configured JSON_ENCODER."""
+    if encoder is None:
+        encoder = api_settings.JSON_ENCODER()
+    if hasattr(encoder, "encode_bytes"):
+        return encoder.encode_bytes(data)
+    return encoder.encode(data).encode("utf-8")
+
+
+def is_async_iterable(value):
+    return hasattr(value, "__aiter__")
+
+
+def has_async_content(data):
+    """Whether data holds async iterables, at the top level or in a dict."""
+    return is_async_iterable(data) or (
+        isinstance(data, dict) and any(map(is_async_iterable, data.values()))
+    )
+
+
+async def aiterencode_json(data, encoder=None):
+    """
+    Incrementally encode data holding async iterables (see
+    has_async_content()) to JSON bytes, one item of an iterable at a time.
+    """
+    if encoder is None:
+        encoder = api_settings.JSON_ENCODER()
+
+    if is_async_iterable(data):
+        yield b"["
+        separator = b""
+        async for item in data:
+            yield separator + encode_json(item, encoder)
+            separator = b","
+        yield b"]"
+    elif has_async_content(data):
+        yield b"{"
+        separator = b""
+        for key, value in data.items():
+            yield separator + encode_json(str(key), encoder) + b":"
+            async for fragment in aiterencode_json(value, encoder):
+                yield fragment
+            separator = b","
+        yield b"}"
+    else:
+        yield encode_json(data, encoder)
 
-    def __init__(self, data, **kwargs):
-        kwargs.setdefault("content_type", "application/json")
-        data = api_settings.JSON_ENCODER().encode(data).encode("utf-8")
-        super().__init__(content=data, **kwargs)
 
+class JSONResponse(http.HttpResponse):
+    """An HTTP response class that consumes data to be serialized to JSON."""
 
-class StreamingJSONResponse(http.StreamingHttpResponse):
     def __init__(self, data, **kwargs):
         kwargs.setdefault("content_type", "application/json")
-        data = api_settings.JSON_ENCODER().iterencode(data)
-        super().__init__(streaming_content=data, **kwargs)
+        super().__init__(content=encode_json(data), **kwargs)
+
+
+class RenderedResponse(http.HttpResponse):
+    """
+    An HTTP response class that consumes data to be rendered with a
+    renderer (see :py:mod:`resticus.renderers`).
+    """
+
+    def __init__(self, data, renderer, **kwargs):
+        kwargs.setdefault("content_type", renderer.media_type)
+        super().__init__(content=renderer.render(data), **kwargs)
+
+
+class StreamingRenderedResponse(http.StreamingHttpResponse):
+    """
+    An HTTP response class that incrementally renders data with a renderer
+    (see :py:mod:`resticus.renderers`). Rendered fragments are buffered
+    into chunks of ``buffer_size`` (by default, the ``STREAMING_BUFFER_SIZE``
+    setting) before they're written out.
+
+    Data may hold async iterators, either at the top level or as the values
+    of a dict, in which case the response content is an async iterator too.
+    """
+
+    def __init__(self, data, renderer, buffer_size=None, **kwargs):
+        kwargs.setdefault("content_type", renderer.media_type)
+        if buffer_size is None:
+            buffer_size = api_settings.STREAMING_BUFFER_SIZE
+
+        if has_async_content(data):
+            content = self.async_content = renderer.aiterrender(data)
+            if buffer_size:
+                content = self.async_content = acoalesce(content, buffer_size)
+            if not ASYNC_STREAMING:
+                # Older Django only streams sync iterators; async endpoints
+                # read the content in full with aread() instead.
+                content = iterate_sync(content)
+        else:
+            self.async_content = None
+            content = renderer.iterrender(data)
+            if buffer_size:
+                content = coalesce(content, buffer_size)
+        super().__init__(streaming_content=content, **kwargs)
+
+    async def aread(self):
+        """
+        Return a regular HttpResponse with the async content encoded in full,
+        and the same status and headers.
+        """
+        content = [fragment async for fragment in self.async_content]
+        response = http.HttpResponse(b"".join(content), status=self.status_code)
+        for header, value in self.items():
+            response[header] = value
+        response.cookies = self.cookies
+        return response
+
+
+class StreamingJSONResponse(StreamingRenderedResponse):
+    """
+    An HTTP response class that incrementally encodes data to JSON, with the
+    ``JSON_ENCODER`` setting.
+    """
+
+    media_type = "application/json"
+
+    def __init__(self, data, buffer_size=None, **kwargs):
+        self.encoder = api_settings.JSON_ENCODER()
+        super().__init__(data, self, buffer_size, **kwargs)
+
+    def iterrender(self, data):
+        return self.encoder.iterencode(data)
+
+    def aiterrender(self, data):
+        return aiterencode_json(data, self.encoder)
 
 
 class JSONErrorResponse(JSONResponse):
@@ -1,3 +1,132 @@
+from collections.abc import Iterator
+from itertools import islice
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db.models import prefetch_related_objects
+
+from .compat import ITERATOR_PREFETCHES
+
+
+def iterate_queryset(queryset, chunk_size):
+    """
+    Iterate over a QuerySet without caching its results, fetching
+    ``chunk_size`` rows at a time from the database. Prefetch lookups are
+    applied per chunk.
+    """
+    if queryset._result_cache is not None:
+        yield from queryset
+        return
+
+    lookups = queryset._prefetch_related_lookups
+    if not lookups or ITERATOR_PREFETCHES:
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+
+    iterator = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        prefetch_related_objects(chunk, *lookups)
+        yield from chunk
+
+
+def prime(iterable):
+    """
+    Take the first item of a lazy iterable, such as a serialized QuerySet,
+    so that errors in its first step (e.g. running the query) are raised
+    now, where they're still handled, rather than while the response is
+    streamed. Returns a generator over all the items.
+    """
+    iterator = iter(iterable)
+    first = next(iterator, _empty)
+    return _resume(first, iterator)
+
+
+_empty = object()
+
+
+def _resume(first, iterator):
+    if first is not _empty:
+        yield first
+        yield from iterator
+
+
+async def aiterate(iterable, chunk_size):
+    """
+    Iterate asynchronously over a blocking iterable, such as a serialized
+    QuerySet. Items are taken ``chunk_size`` at a time, in a thread.
+    """
+    if not isinstance(iterable, Iterator):
+        # Iterating a QuerySet runs its query.
+        iterable = await sync_to_async(iter)(iterable)
+
+    next_chunk = sync_to_async(lambda: list(islice(iterable, chunk_size)))
+    while True:
+        chunk = await next_chunk()
+        if not chunk:
+            return
+        for item in chunk:
+            yield item
+
+
+def iterate_sync(aiterable):
+    """
+    Iterate over an async iterable from sync code, outside of any event loop.
+    """
+    aiterator = aiterable.__aiter__()
+
+    async def next_item():
+        return await aiterator.__anext__()
+
+    next_item = async_to_sync(next_item)
+    while True:
+        try:
+            yield next_item()
+        except StopAsyncIteration:
+            return
+
+
+def coalesce(fragments, size, encoding="utf-8"):
+    """
+    Pack an iterable of small str or bytes fragments (such as the output of
+    ``JSONEncoder.iterencode()``) into bytes chunks of roughly ``size``
+    characters, so a streamed response isn't written one token at a time.
+    """
+    buffer = []
+    buffered = 0
+    for fragment in fragments:
+        buffer.append(fragment)
+        buffered += len(fragment)
+        if buffered >= size:
+            yield _join(buffer, encoding)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield _join(buffer, encoding)
+
+
+async def acoalesce(fragments, size, encoding="utf-8"):
+    """Like coalesce(), for an async iterable of fragments."""
+    buffer = []
+    buffered = 0
+    async for fragment in fragments:
+        buffer.append(fragment)
+        buffered += len(fragment)
+        if buffered >= size:
+            yield _join(buffer, encoding)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield _join(buffer, encoding)
+
+
+def _join(fragments, encoding):
+    if isinstance(fragments[0], bytes):
+        return b"".join(fragments)
+    return "".join(fragments).encode(encoding)
+
+
 # Adapted from
 # https://www.mysociety.org/2015/06/01/django-streaminghttpresponse-json-html/
 
@@ -49,8 +178,6 @@ class iterlist(list):
         return not self.empty
 
     def __iter__(self):
-        if self.empty:
-            yield next(iter([]))
-        else:
+        if not self.empty:
             yield self.first
             yield from self.source
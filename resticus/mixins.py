@@ -1,4 +1,16 @@
-from . import http
+from collections.abc import Iterator
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.utils.translation import gettext as _
+
+from . import exceptions, http
+from .cache import invalidate_model
+from .iterators import aiterate
+from .pagination import CursorPaginator
+from .permissions import BasePermission
+from .settings import api_settings
 from .utils import patch_form
 
 __all__ = [
@@ -7,6 +19,15 @@ __all__ = [
     "CreateModelMixin",
     "UpdateModelMixin",
     "DeleteModelMixin",
+    "BulkCreateModelMixin",
+    "BulkUpdateModelMixin",
+    "BulkDeleteModelMixin",
+    "AsyncListModelMixin",
+    "AsyncDetailModelMixin",
+    "AsyncCreateModelMixin",
+    "AsyncUpdateModelMixin",
+    "AsyncPatchModelMixin",
+    "AsyncDeleteModelMixin",
 ]
 
 
@@ -19,11 +40,20 @@ class ListModelMixin(object):
         """
         queryset = self.get_queryset()
         queryset = self.filter_queryset(queryset)
+        not_modified = self.get_list_conditional_response(queryset)
+        if not_modified is not None:
+            return not_modified
+
+        queryset = self.optimize_queryset(queryset)
         queryset = self.paginate_queryset(queryset)
 
         response = {"data": self.serialize(queryset)}
 
-        if self.paginator is not None:
+        if isinstance(self.paginator, CursorPaginator):
+            response.update(
+                next=self.page.next_cursor, previous=self.page.previous_cursor
+            )
+        elif self.paginator is not None:
             response.update(
                 page=self.page.number,
                 count=self.paginator.count,
@@ -40,6 +70,9 @@ class DetailModelMixin(object):
         Returns a single object.
         """
         self.object = self.get_object()
+        not_modified = self.get_object_conditional_response(self.object)
+        if not_modified is not None:
+            return not_modified
         return {"data": self.serialize(self.object)}
 
 
@@ -98,3 +131,292 @@ class DeleteModelMixin(object):
         self.object = self.get_object()
         self.object.delete()
         return http.Http204()
+
+
+# The bulk mixins take a JSON list of objects (or of lookup values, to
+# delete), and write them all in one transaction, with bulk queries.
+
+
+class BulkModelMixin(object):
+    bulk_batch_size = api_settings.BULK_BATCH_SIZE
+
+    def get_bulk_data(self, request, objects=True):
+        data = request.data
+        if not isinstance(data, list) or (
+            objects and not all(isinstance(item, dict) for item in data)
+        ):
+            raise exceptions.ParseError(
+                _("Expected a list of objects.") if objects else _("Expected a list.")
+            )
+        return data
+
+    def get_bulk_lookup_key(self):
+        """
+        The key holding the lookup value in each item, i.e. the name of the
+        primary key when looking up objects by "pk".
+        """
+        if self.lookup_field == "pk":
+            return self.model._meta.pk.name
+        return self.lookup_field
+
+    def get_lookup_value(self, value):
+        """
+        Returns the lookup value of an item as the lookup field's Python
+        value, or raises ``ValueError`` if it isn't valid for the field.
+        """
+        if self.lookup_field == "pk":
+            field = self.model._meta.pk
+        else:
+            field = self.model._meta.get_field(self.lookup_field)
+        if isinstance(value, (dict, list)):
+            raise ValueError(value)
+        try:
+            value = field.to_python(value)
+            field.get_prep_value(value)
+        except (TypeError, ValidationError):
+            raise ValueError(value)
+        return value
+
+    def has_m2m_data(self, form):
+        return any(
+            form.cleaned_data.get(field.name) for field in self.model._meta.many_to_many
+        )
+
+    def validate_forms(self, forms):
+        errors = {
+            index: form for index, form in enumerate(forms) if not form.is_valid()
+        }
+        if errors:
+            raise exceptions.BulkValidationError(errors)
+
+    def save_forms(self, forms, write):
+        """
+        Saves the forms' objects with ``write(objects)``, and then their
+        many-to-many data, in one transaction.
+        """
+        objects = [form.save(commit=False) for form in forms]
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            write(objects)
+            for form, obj in zip(forms, objects):
+                if obj.pk is not None:
+                    form.save_m2m()
+        # Bulk writes don't send post_save signals.
+        invalidate_model(self.model)
+        return objects
+
+
+class BulkCreateModelMixin(BulkModelMixin):
+    def post(self, request, *args, **kwargs):
+        """
+        Add new objects. On databases where bulk_create() doesn't set the
+        primary keys (such as MySQL), they're null in the response, except
+        for objects with many-to-many data, which are saved one at a time.
+        """
+        forms = [self.get_form(data=item) for item in self.get_bulk_data(request)]
+        self.validate_forms(forms)
+        db = router.db_for_write(self.model)
+        features = connections[db].features
+
+        def write(objects):
+            if not features.can_return_rows_from_bulk_insert:
+                # bulk_create() doesn't set primary keys on this database, so
+                # objects with many-to-many data are saved one at a time.
+                for form, obj in zip(forms, objects):
+                    if self.has_m2m_data(form):
+                        obj.save(using=db)
+                objects = [obj for obj in objects if obj.pk is None]
+            self.model._default_manager.bulk_create(
+                objects, batch_size=self.bulk_batch_size
+            )
+
+        objects = self.save_forms(forms, write)
+        return http.Http201({"data": self.serialize(objects)})
+
+
+class BulkUpdateModelMixin(BulkModelMixin):
+    def put(self, request, *args, **kwargs):
+        """
+        Update existing objects.
+        """
+        return self.bulk_update(request, partial=False)
+
+    def patch(self, request, *args, **kwargs):
+        """
+        Update fields of existing objects.
+        """
+        return self.bulk_update(request, partial=True)
+
+    def get_objects(self, values):
+        """
+        Returns a dict of the objects matching the lookup ``values``.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return queryset.in_bulk(values, field_name=self.lookup_field)
+
+    def bulk_update(self, request, partial):
+        data = self.get_bulk_data(request)
+        key = self.get_bulk_lookup_key()
+
+        values, errors = {}, {}
+        for index, item in enumerate(data):
+            try:
+                values[index] = self.get_lookup_value(item.get(key))
+            except ValueError:
+                message = {"message": _("Invalid lookup value"), "code": "invalid"}
+                errors[index] = {key: [message]}
+        objects = self.get_objects(
+            [value for value in values.values() if value is not None]
+        )
+
+        forms = []
+        for index, item in enumerate(data):
+            if index in errors:
+                continue
+            obj = objects.get(values[index])
+            if obj is None:
+                message = {"message": _("Resource not found"), "code": "not_found"}
+                errors[index] = {key: [message]}
+                continue
+            self.check_object_permissions(request, obj)
+            form = self.get_form(data=item, instance=obj)
+            forms.append(patch_form(form) if partial else form)
+        if errors:
+            raise exceptions.BulkValidationError(errors)
+        self.validate_forms(forms)
+
+        # Only the fields some item was validated for, and the auto_now
+        # fields, which bulk_update() doesn't set.
+        names = set()
+        for form in forms:
+            names.update(form.fields)
+        fields = [
+            field
+            for field in self.model._meta.concrete_fields
+            if (field.name in names or getattr(field, "auto_now", False))
+            and not field.primary_key
+        ]
+
+        def write(objects):
+            if fields:
+                for obj in objects:
+                    for field in fields:
+                        field.pre_save(obj, False)
+                self.model._default_manager.bulk_update(
+                    objects,
+                    [field.name for field in fields],
+                    batch_size=self.bulk_batch_size,
+                )
+
+        objects = self.save_forms(forms, write)
+        return {"data": self.serialize(objects)}
+
+
+class BulkDeleteModelMixin(BulkModelMixin):
+    data_methods = ("POST", "PUT", "PATCH", "DELETE")
+
+    def delete(self, request, *args, **kwargs):
+        """
+        Delete the objects matching a list of lookup values. Values which
+        don't match any object are ignored.
+        """
+        values, errors = [], {}
+        for index, value in enumerate(self.get_bulk_data(request, objects=False)):
+            try:
+                values.append(self.get_lookup_value(value))
+            except ValueError:
+                message = {"message": _("Invalid lookup value"), "code": "invalid"}
+                errors[index] = {self.get_bulk_lookup_key(): [message]}
+        if errors:
+            raise exceptions.BulkValidationError(errors)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.filter(**{self.lookup_field + "__in": values})
+
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            if self.checks_object_permissions():
+                for obj in queryset.select_for_update():
+                    self.check_object_permissions(request, obj)
+            queryset.delete()
+        return http.Http204()
+
+    def checks_object_permissions(self):
+        """
+        Whether any permission checks objects, i.e. whether the objects need
+        to be loaded before they're deleted.
+        """
+        return any(
+            type(permission).has_object_permission
+            is not BasePermission.has_object_permission
+            for permission in self.get_permissions()
+        )
+
+
+# The async mixins run the ORM work of their sync counterparts in a thread
+# (in a single hop per request), for use with AsyncEndpoint.
+
+
+class AsyncListModelMixin(ListModelMixin):
+    async def get(self, request, *args, **kwargs):
+        """
+        Returns a list of objects. Lazily serialized (streamed) lists are
+        fetched in a thread, chunk_size objects at a time.
+        """
+        response = await sync_to_async(super(AsyncListModelMixin, self).get)(
+            request, *args, **kwargs
+        )
+        if isinstance(response, dict) and isinstance(response["data"], Iterator):
+            response["data"] = aiterate(response["data"], self.chunk_size)
+        return response
+
+
+class AsyncDetailModelMixin(DetailModelMixin):
+    async def get(self, request, *args, **kwargs):
+        """
+        Returns a single object.
+        """
+        return await sync_to_async(super(AsyncDetailModelMixin, self).get)(
+            request, *args, **kwargs
+        )
+
+
+class AsyncCreateModelMixin(CreateModelMixin):
+    async def put(self, request, *args, **kwargs):
+        return await sync_to_async(super(AsyncCreateModelMixin, self).put)(
+            request, *args, **kwargs
+        )
+
+    async def post(self, request, *args, **kwargs):
+        """
+        Add new object.
+        """
+        return await self.put(request, *args, **kwargs)
+
+
+class AsyncUpdateModelMixin(UpdateModelMixin):
+    async def put(self, request, *args, **kwargs):
+        """
+        Update existing object.
+        """
+        return await sync_to_async(super(AsyncUpdateModelMixin, self).put)(
+            request, *args, **kwargs
+        )
+
+
+class AsyncPatchModelMixin(PatchModelMixin):
+    async def patch(self, request, *args, **kwargs):
+        """
+        Update existing object.
+        """
+        return await sync_to_async(super(AsyncPatchModelMixin, self).patch)(
+            request, *args, **kwargs
+        )
+
+
+class AsyncDeleteModelMixin(DeleteModelMixin):
+    async def delete(self, request, *args, **kwargs):
+        """
+        Delete object.
+        """
+        return await sync_to_async(super(AsyncDeleteModelMixin, self).delete)(
+            request, *args, **kwargs
+        )
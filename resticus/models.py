@@ -1,8 +1,14 @@
 import binascii
+import hashlib
+import hmac
 import os
+import threading
+import time
+from collections import defaultdict
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 from .compat import AUTH_USER_MODEL
 from .settings import api_settings
@@ -37,3 +43,123 @@ class Token(BaseToken):
 
     def get_user(self):
         return self.user
+
+
+class BaseHashedToken(models.Model):
+    """
+    An API token that's only stored as a SHA-256 digest of its key, and
+    looked up by an indexed prefix of the key. The key itself is only
+    available (as ``token.key``) on the instance that created it.
+    """
+
+    prefix_length = 8
+
+    prefix = models.CharField(max_length=prefix_length, db_index=True, editable=False)
+    digest = models.CharField(max_length=64, editable=False)
+    created = models.DateTimeField(auto_now_add=True)
+    expires = models.DateTimeField(null=True, blank=True, db_index=True)
+    last_used = models.DateTimeField(null=True, blank=True, editable=False)
+
+    key = None
+
+    def __str__(self):
+        return self.prefix
+
+    def save(self, *args, **kwargs):
+        if not self.digest:
+            self.key = self.generate_key()
+            self.prefix = self.key[: self.prefix_length]
+            self.digest = self.hash_key(self.key)
+        return super(BaseHashedToken, self).save(*args, **kwargs)
+
+    def generate_key(self):
+        return binascii.hexlify(os.urandom(20)).decode()
+
+    @staticmethod
+    def hash_key(key):
+        # Keys are random, so a (fast) unsalted hash is enough.
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def get_lookup_queryset(cls):
+        return cls._default_manager.all()
+
+    @classmethod
+    def lookup(cls, key):
+        """
+        Returns the token with the given key, or None.
+        """
+        digest = cls.hash_key(key)
+        queryset = cls.get_lookup_queryset().filter(prefix=key[: cls.prefix_length])
+        for token in queryset:
+            if hmac.compare_digest(token.digest, digest):
+                return token
+
+    @classmethod
+    def purge_expired(cls):
+        """
+        Deletes the tokens that have expired.
+        """
+        return cls._default_manager.filter(expires__lte=timezone.now()).delete()
+
+    def is_expired(self):
+        return self.expires is not None and self.expires <= timezone.now()
+
+    def record_usage(self):
+        last_used.record(self)
+
+    def get_user(self):
+        raise NotImplementedError
+
+    class Meta:
+        abstract = True
+
+
+class HashedToken(BaseHashedToken):
+    user = models.ForeignKey(
+        AUTH_USER_MODEL, related_name="api_tokens", on_delete=models.CASCADE
+    )
+
+    @classmethod
+    def get_lookup_queryset(cls):
+        return cls._default_manager.select_related("user")
+
+    def get_user(self):
+        return self.user
+
+
+class LastUsedRecorder(object):
+    """
+    Records when tokens were last used in memory, and writes them to the
+    database in bulk, once every ``TOKEN_LAST_USED_INTERVAL`` seconds.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.flushed = time.monotonic()
+        self.lock = threading.Lock()
+
+    def record(self, token):
+        interval = api_settings.TOKEN_LAST_USED_INTERVAL
+        if interval is None:
+            return
+
+        with self.lock:
+            self.pending[(type(token), token.pk)] = timezone.now()
+            due = time.monotonic() - self.flushed >= interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flushed = time.monotonic()
+
+        tokens = defaultdict(list)
+        for (model, pk), timestamp in pending.items():
+            tokens[model].append(model(pk=pk, last_used=timestamp))
+        for model, instances in tokens.items():
+            model._default_manager.bulk_update(instances, ["last_used"])
+
+
+last_used = LastUsedRecorder()
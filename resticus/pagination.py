@@ -0,0 +1,346 @@
+import base64
+import binascii
+import hashlib
+
+from django.core import paginator
+from django.core.cache import caches
+from django.core.exceptions import (
+    EmptyResultSet,
+    FieldDoesNotExist,
+    ImproperlyConfigured,
+    ValidationError,
+)
+from django.db import connections
+from django.db.models import IntegerField, Q, QuerySet
+from django.utils.functional import cached_property
+from django.utils.translation import gettext as _
+
+from .compat import json
+from .settings import api_settings
+
+__all__ = [
+    "COUNT_STRATEGIES",
+    "Paginator",
+    "Page",
+    "CursorPaginator",
+    "CursorPage",
+    "InvalidCursor",
+]
+
+COUNT_STRATEGIES = ("exact", "none", "cached", "estimate")
+
+
+class Page(paginator.Page):
+    def __init__(self, object_list, number, paginator, next_page=None):
+        super().__init__(object_list, number, paginator)
+        self.next_page = next_page
+
+    def has_next(self):
+        if self.next_page is not None:
+            return self.next_page
+        return super().has_next()
+
+
+class Paginator(paginator.Paginator):
+    """
+    A Paginator which doesn't have to run a ``SELECT COUNT(*)`` on every
+    page. ``count_strategy`` is one of:
+
+    * ``"exact"``: count the objects every time.
+    * ``"none"``: don't count them; ``count`` and ``num_pages`` are None.
+    * ``"cached"``: count them once per query (i.e. per set of filters),
+      and cache the count for ``cache_timeout`` seconds.
+    * ``"estimate"``: use the planner's row estimate on PostgreSQL, unless
+      it's below ``estimate_threshold``, or on other databases.
+
+    Unless the count is exact, whether there's a next page is checked with
+    an EXISTS query, and pages past the (estimated) last one are only
+    rejected when they're empty.
+    """
+
+    def __init__(
+        self,
+        object_list,
+        per_page,
+        count_strategy="exact",
+        cache_timeout=None,
+        estimate_threshold=None,
+        **kwargs
+    ):
+        if count_strategy not in COUNT_STRATEGIES:
+            raise ValueError("Unknown count strategy: {0!r}".format(count_strategy))
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_strategy = count_strategy
+        self.cache_timeout = cache_timeout
+        self.estimate_threshold = estimate_threshold
+        self.count_is_exact = count_strategy == "exact"
+
+    @cached_property
+    def count(self):
+        if self.count_strategy == "none":
+            return None
+        elif not isinstance(self.object_list, QuerySet):
+            self.count_is_exact = True
+        elif self.count_strategy == "cached":
+            return self.cached_count()
+        elif self.count_strategy == "estimate":
+            estimate = self.estimate_count()
+            if estimate is not None and estimate >= self.estimate_threshold:
+                return estimate
+            self.count_is_exact = True
+        return super().count
+
+    @cached_property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        return super().num_pages
+
+    def get_count_query(self):
+        """
+        Returns the SQL and params of the (unordered) query, or None if it
+        can't match any rows.
+        """
+        try:
+            queryset = self.object_list.order_by()
+            return queryset.query.get_compiler(queryset.db).as_sql()
+        except EmptyResultSet:
+            return None
+
+    def cached_count(self):
+        query = self.get_count_query()
+        if query is None:
+            return 0
+
+        sql, params = query
+        signature = "{0}:{1}:{2!r}".format(self.object_list.db, sql, params)
+        key = "resticus:count:{0}".format(
+            hashlib.sha256(signature.encode("utf-8")).hexdigest()
+        )
+        cache = caches[api_settings.PAGE_COUNT_CACHE]
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            cache.set(key, count, self.cache_timeout)
+        return count
+
+    def estimate_count(self):
+        """
+        Returns the planner's estimate of the number of rows, or None if the
+        database can't tell.
+        """
+        connection = connections[self.object_list.db]
+        if connection.vendor != "postgresql":
+            return None
+
+        query = self.get_count_query()
+        if query is None:
+            return 0
+
+        sql, params = query
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def validate_number(self, number):
+        if self.count is not None and self.count_is_exact:
+            return super().validate_number(number)
+
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise paginator.PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise paginator.EmptyPage(_("That page number is less than 1"))
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if self.count is not None and self.count_is_exact:
+            return super().page(number)
+
+        # The page stays a lazy slice (to be streamed, or serialized from
+        # values()), and whether there's a next one is a separate query.
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        next_page = self.has_rows(self.object_list[top : top + 1])
+        if not next_page and number > 1:
+            if not self.has_rows(self.object_list[bottom:top]):
+                raise paginator.EmptyPage(_("That page contains no results"))
+        return self._get_page(
+            self.object_list[bottom:top], number, self, next_page=next_page
+        )
+
+    @staticmethod
+    def has_rows(object_list):
+        if isinstance(object_list, QuerySet):
+            return object_list.exists()
+        return len(object_list) > 0
+
+    def _get_page(self, *args, **kwargs):
+        return Page(*args, **kwargs)
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage(object):
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(object):
+    """
+    Keyset ("cursor") pagination: pages are found by filtering on the
+    ordering fields, relative to the first or last object of the page the
+    client is coming from, rather than with an OFFSET. As long as the
+    ordering is indexed, every page is as fast to fetch as the first one.
+
+    The primary key is appended to the ordering if it isn't in it, so that
+    it's unique. Ordering fields shouldn't be nullable.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+        ordering = list(ordering)
+        names = [name.lstrip("-") for name in ordering]
+        for name in names:
+            try:
+                self.get_field(name)
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(
+                    "Cursor ordering fields must be fields of {0}, not {1!r}.".format(
+                        queryset.model.__name__, name
+                    )
+                )
+        pk_name = queryset.model._meta.pk.name
+        if "pk" not in names and pk_name not in names:
+            ordering.append("pk")
+        self.ordering = ordering
+
+    def page(self, cursor=None):
+        if cursor:
+            reverse, position = self.decode_cursor(cursor)
+        else:
+            reverse, position = False, None
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.flip(name) for name in ordering]
+        queryset = self.queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, position))
+
+        # One extra object tells whether there's another page.
+        object_list = list(queryset[: self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[: self.per_page]
+        if reverse:
+            # Coming back from the next page.
+            object_list.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        next_cursor = previous_cursor = None
+        if object_list and has_next:
+            next_cursor = self.encode_cursor(False, object_list[-1])
+        if object_list and has_previous:
+            previous_cursor = self.encode_cursor(True, object_list[0])
+        return CursorPage(object_list, next_cursor, previous_cursor)
+
+    @staticmethod
+    def flip(name):
+        return name[1:] if name.startswith("-") else "-" + name
+
+    def get_keyset_filter(self, ordering, position):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        keyset = Q()
+        for index, name in enumerate(ordering):
+            condition = self.compare(name, position[index], "gt", "lt")
+            for previous, value in zip(ordering[:index], position):
+                condition &= Q(**{previous.lstrip("-"): value})
+            keyset |= condition
+
+        if len(ordering) > 1:
+            # Redundant, but lets the database scan an index range for a.
+            keyset &= self.compare(ordering[0], position[0], "gte", "lte")
+        return keyset
+
+    @staticmethod
+    def compare(name, value, ascending, descending):
+        lookup = descending if name.startswith("-") else ascending
+        return Q(**{"{0}__{1}".format(name.lstrip("-"), lookup): value})
+
+    def get_field(self, name):
+        name = name.lstrip("-")
+        opts = self.queryset.model._meta
+        field = opts.pk if name == "pk" else opts.get_field(name)
+        if not field.concrete or field.many_to_many:
+            raise FieldDoesNotExist(name)
+        return field
+
+    def encode_cursor(self, reverse, obj):
+        # Positions are encoded losslessly (e.g. datetimes with their
+        # microseconds), as strings that to_python() reads back.
+        position = [self.get_field(name).value_to_string(obj) for name in self.ordering]
+        data = json.dumps([reverse, position]).encode("utf-8")
+        return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            reverse, position = json.loads(data.decode("utf-8"))
+        except (binascii.Error, TypeError, UnicodeDecodeError, ValueError):
+            raise InvalidCursor()
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise InvalidCursor()
+
+        try:
+            position = [
+                self.get_position_value(self.get_field(name), value)
+                for name, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, TypeError, ValueError, OverflowError):
+            raise InvalidCursor()
+        return bool(reverse), position
+
+    def get_position_value(self, field, value):
+        """
+        Returns the Python value of a field's position in a cursor, or raises
+        ValueError if it isn't one the field can be filtered by.
+        """
+        if isinstance(value, (list, dict)):
+            raise ValueError(value)
+        value = field.to_python(value)
+        field.get_prep_value(value)
+        target = getattr(field, "target_field", field)
+        if isinstance(target, IntegerField) and value is not None:
+            connection = connections[self.queryset.db]
+            internal_type = target.get_internal_type()
+            min_value, max_value = connection.ops.integer_field_range(internal_type)
+            # Databases without ranges (SQLite) still store 64-bit integers.
+            if min_value is None:
+                min_value = -(2**63)
+            if max_value is None:
+                max_value = 2**63 - 1
+            if not min_value <= value <= max_value:
+                raise ValueError(value)
+        return value
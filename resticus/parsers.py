@@ -6,6 +6,16 @@ from django.utils.translation import gettext as _
 from .exceptions import ParseError
 from .settings import api_settings
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
 
 def parse_content_type(content_type):
     if ";" in content_type:
@@ -32,18 +42,41 @@ def parse_json(request, **extra):
         raise ParseError()
 
 
+def parse_msgpack(request, **extra):
+    if msgpack is None:
+        raise ParseError(_("MessagePack isn't supported."))
+    try:
+        return (msgpack.unpackb(request.body, raw=False), None)
+    except Exception:
+        raise ParseError()
+
+
+def parse_cbor(request, **extra):
+    if cbor2 is None:
+        raise ParseError(_("CBOR isn't supported."))
+    try:
+        return (cbor2.loads(request.body), None)
+    except Exception:
+        raise ParseError()
+
+
 def parse_form_encoded(request, **extra):
     return (request.POST, None)
 
 
 def parse_multipart(request, **extra):
-    if hasattr(request, "_body"):
-        # Use already read data
-        data = BytesIO(request._body)
-    else:
-        data = request
-
     try:
+        if request.method == "POST":
+            # Django parses POST uploads from the request stream (unless the
+            # body was already read), and only once, even if e.g. the CSRF
+            # check got to request.POST first.
+            return (request.POST, request.FILES)
+
+        if hasattr(request, "_body"):
+            # Use already read data
+            data = BytesIO(request._body)
+        else:
+            data = request
         return request.parse_file_upload(request.META, data)
     except MultiPartParserError as err:
         raise ParseError()
@@ -1,11 +1,18 @@
+from .utils import call_async
+
 SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
 
 
 class BasePermission(object):
     """
     A base class from which all permission classes should inherit.
+
+    Permissions are instantiated once per endpoint and shared between
+    requests; set `stateful = True` to get a new instance per request.
     """
 
+    stateful = False
+
     def has_permission(self, request, view):
         """
         Return `True` if permission is granted, `False` otherwise.
@@ -18,8 +25,35 @@ class BasePermission(object):
         """
         return True
 
+    async def ahas_permission(self, request, view):
+        """
+        Async version of has_permission(), used by AsyncEndpoint. Runs
+        has_permission() in a thread, unless it's a coroutine function.
+        """
+        return await call_async(self.has_permission, request, view)
+
+    async def ahas_object_permission(self, request, view, obj):
+        """
+        Async version of has_object_permission(), used by AsyncEndpoint.
+        """
+        return await call_async(self.has_object_permission, request, view, obj)
+
+
+class RequestPermission(BasePermission):
+    """
+    A base class for permissions that only look at the request and its
+    (already authenticated) user, so async endpoints can check them
+    without a thread.
+    """
+
+    async def ahas_permission(self, request, view):
+        return self.has_permission(request, view)
+
+    async def ahas_object_permission(self, request, view, obj):
+        return self.has_object_permission(request, view, obj)
+
 
-class AllowAny(BasePermission):
+class AllowAny(RequestPermission):
     """
     Allow any access.
     This isn't strictly required, since you could use an empty
@@ -31,7 +65,7 @@ class AllowAny(BasePermission):
         return True
 
 
-class IsAuthenticated(BasePermission):
+class IsAuthenticated(RequestPermission):
     """
     Allows access only to authenticated users.
     """
@@ -40,7 +74,7 @@ class IsAuthenticated(BasePermission):
         return request.user and request.user.is_authenticated
 
 
-class IsAdminUser(BasePermission):
+class IsAdminUser(RequestPermission):
     """
     Allows access only to admin users.
     """
@@ -49,7 +83,7 @@ class IsAdminUser(BasePermission):
         return request.user and request.user.is_staff
 
 
-class IsAuthenticatedOrReadOnly(BasePermission):
+class IsAuthenticatedOrReadOnly(RequestPermission):
     """
     The request is authenticated as a user, or is a read-only request.
     """
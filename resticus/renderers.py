@@ -0,0 +1,639 @@
+import csv
+import datetime
+import decimal
+import io
+import re
+import struct
+import types
+from collections.abc import Iterator
+
+from .compat import json
+from .encoders import RawJSON
+from .http import aiterencode_json, encode_json, has_async_content, is_async_iterable
+from .iterators import iterdict, iterlist
+from .settings import api_settings
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+__all__ = [
+    "BaseRenderer",
+    "JSONRenderer",
+    "MessagePackRenderer",
+    "CBORRenderer",
+    "NDJSONRenderer",
+    "TabularRenderer",
+    "CSVRenderer",
+    "ArrowRenderer",
+    "ParquetRenderer",
+    "negotiate_renderer",
+]
+
+
+def is_lazy(value):
+    return isinstance(value, (types.GeneratorType, Iterator, iterlist))
+
+
+def split_rows(data):
+    """
+    Returns the rows of list data (the list, or the ``"data"`` list of a
+    dict), and the rest of the dict as metadata. A single object (or the
+    ``"data"`` object of a dict) is a single row.
+    """
+    if isinstance(data, iterdict):
+        data = dict(data.items())
+    if isinstance(data, dict) and "data" in data:
+        rows = data["data"]
+        metadata = {key: value for key, value in data.items() if key != "data"}
+    else:
+        rows, metadata = data, {}
+    if isinstance(rows, (list, tuple)) or is_lazy(rows) or is_async_iterable(rows):
+        return rows, metadata
+    return [rows], metadata
+
+
+class BaseRenderer(object):
+    """
+    Renderers turn the data returned by endpoints into bytes of their
+    ``media_type``, either in full with render(), or incrementally with
+    iterrender() (and aiterrender(), for data holding async iterables), for
+    streamed responses. Generators and iterators are rendered lazily when
+    they're at the top level, or the values of a dict, as with JSON.
+
+    Subclasses implement render(), map_header(), and array() and aarray(),
+    which render the items of a lazy list.
+    """
+
+    media_type = None
+    # Short name, which can be asked for with a query parameter.
+    format = None
+    # Whether the format's library is installed.
+    available = True
+
+    def __init__(self):
+        self.json_encoder = api_settings.JSON_ENCODER()
+
+    def render(self, data):
+        raise NotImplementedError()
+
+    def map_header(self, count):
+        raise NotImplementedError()
+
+    def array(self, items):
+        raise NotImplementedError()
+
+    async def aarray(self, items):
+        raise NotImplementedError()
+        yield
+
+    def iterrender(self, data):
+        if is_lazy(data):
+            yield from self.array(data)
+        elif isinstance(data, iterdict):
+            yield from self.iterrender(dict(data.items()))
+        elif isinstance(data, dict) and any(map(is_lazy, data.values())):
+            yield self.map_header(len(data))
+            for key, value in data.items():
+                yield self.render(key)
+                yield from self.iterrender(value)
+        else:
+            yield self.render(data)
+
+    async def aiterrender(self, data):
+        if is_async_iterable(data):
+            async for fragment in self.aarray(data):
+                yield fragment
+        elif has_async_content(data):
+            yield self.map_header(len(data))
+            for key, value in data.items():
+                yield self.render(key)
+                async for fragment in self.aiterrender(value):
+                    yield fragment
+        else:
+            yield self.render(data)
+
+    def default(self, obj):
+        """
+        Convert values the format can't represent the same way the JSON
+        encoder does, e.g. datetimes to ISO 8601 strings, and Decimals to
+        strings.
+        """
+        if isinstance(obj, (tuple, types.GeneratorType, Iterator, iterlist)):
+            return list(obj)
+        elif isinstance(obj, iterdict):
+            return dict(obj.items())
+        elif isinstance(obj, RawJSON):
+            return json.loads(obj.value)
+        for base in (bool, int, float, str, bytes, list, dict):
+            if isinstance(obj, base):
+                # E.g. enums, or SafeStrings.
+                return base(obj)
+        return self.json_encoder.default(obj)
+
+
+class JSONRenderer(BaseRenderer):
+    media_type = "application/json"
+    format = "json"
+
+    def render(self, data):
+        return encode_json(data, self.json_encoder)
+
+    def iterrender(self, data):
+        return self.json_encoder.iterencode(data)
+
+    def aiterrender(self, data):
+        return aiterencode_json(data, self.json_encoder)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders MessagePack, which needs the msgpack package. Arrays are
+    prefixed with their length, so the items of a lazy list are buffered
+    (encoded) until the end of the list.
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    available = msgpack is not None
+
+    def __init__(self):
+        super().__init__()
+        # With strict types, subclasses of builtin types (such as the lazy
+        # iterlist) go through default().
+        self.packer = msgpack.Packer(
+            default=self.default, use_bin_type=True, strict_types=True
+        )
+
+    def render(self, data):
+        return self.packer.pack(data)
+
+    def map_header(self, count):
+        return self.packer.pack_map_header(count)
+
+    def array(self, items):
+        items = [self.render(item) for item in items]
+        yield self.packer.pack_array_header(len(items))
+        yield from items
+
+    async def aarray(self, items):
+        items = [self.render(item) async for item in items]
+        yield self.packer.pack_array_header(len(items))
+        for item in items:
+            yield item
+
+
+class CBORRenderer(BaseRenderer):
+    """
+    Renders CBOR, which needs the cbor2 package. Lazy lists are streamed as
+    indefinite-length arrays.
+    """
+
+    media_type = "application/cbor"
+    format = "cbor"
+    available = cbor2 is not None
+
+    def render(self, data):
+        return cbor2.dumps(self.prepare(data))
+
+    def prepare(self, value):
+        # cbor2 has its own encodings of datetimes, Decimals and such, and
+        # would encode the (lazy) subclasses of lists and dicts as such, so
+        # every value is converted up front.
+        value_type = type(value)
+        if value_type in (str, int, float, bool, bytes) or value is None:
+            return value
+        elif value_type is dict:
+            return {self.prepare(k): self.prepare(v) for k, v in value.items()}
+        elif value_type is list:
+            return [self.prepare(item) for item in value]
+        return self.prepare(self.default(value))
+
+    def map_header(self, count):
+        # Major type 5 (map), with the count in the shortest form.
+        if count < 24:
+            return struct.pack(">B", 0xA0 | count)
+        elif count < 0x100:
+            return struct.pack(">BB", 0xB8, count)
+        elif count < 0x10000:
+            return struct.pack(">BH", 0xB9, count)
+        return struct.pack(">BI", 0xBA, count)
+
+    def array(self, items):
+        yield b"\x9f"
+        for item in items:
+            yield self.render(item)
+        yield b"\xff"
+
+    async def aarray(self, items):
+        yield b"\x9f"
+        async for item in items:
+            yield self.render(item)
+        yield b"\xff"
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renders newline-delimited JSON (JSON Lines): each row (see split_rows())
+    on its own line, followed by a line with the metadata (e.g. pagination)
+    under ``metadata_key``, unless that's None.
+
+    Lines are encoded one item at a time, so lazy lists are streamed in
+    constant memory, and clients can decode them as they arrive.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    metadata_key = "meta"
+
+    def render(self, data):
+        return b"".join(self.iterrender(data))
+
+    def line(self, value):
+        return encode_json(value, self.json_encoder) + b"\n"
+
+    def iterrender(self, data):
+        rows, metadata = split_rows(data)
+        for row in rows:
+            yield self.line(row)
+        if metadata and self.metadata_key is not None:
+            yield self.line({self.metadata_key: metadata})
+
+    async def aiterrender(self, data):
+        rows, metadata = split_rows(data)
+        if is_async_iterable(rows):
+            async for row in rows:
+                yield self.line(row)
+        else:
+            for row in rows:
+                yield self.line(row)
+        if metadata and self.metadata_key is not None:
+            yield self.line({self.metadata_key: metadata})
+
+
+class TabularRenderer(BaseRenderer):
+    """
+    Base class of renderers of tables, with a column per field of the rows
+    (see split_rows()), in the order of the serializer's field spec.
+    Nested objects are flattened into columns named after their path, e.g.
+    ``author.name``, and lists are rendered as JSON.
+
+    The columns are the ``columns`` set by the endpoint (generic endpoints
+    set them from the field spec), or else the keys of the rows of the
+    first batch.
+
+    Rows are rendered in batches of ``batch_size`` (by default, the
+    ``STREAMING_CHUNK_SIZE`` setting), with a writer from get_writer(),
+    which returns the bytes of each batch with write(), and the rest of
+    the output with close(). Writers are made with the first batch, or
+    with all rows, if they're in memory (not lazy).
+    """
+
+    batch_size = None
+    columns = None
+    # Values that are written as they are.
+    native_types = (str, int, float, bool)
+
+    def render(self, data):
+        return b"".join(self.iterrender(data))
+
+    def get_writer(self, columns, batch, metadata):
+        raise NotImplementedError()
+
+    def get_batch_size(self):
+        return self.batch_size or api_settings.STREAMING_CHUNK_SIZE
+
+    def get_columns(self, batch):
+        if self.columns is not None:
+            return list(self.columns)
+        columns = {}
+        for row in batch:
+            columns.update(dict.fromkeys(row))
+        return list(columns)
+
+    def flatten(self, row, prefix=""):
+        if isinstance(row, iterdict):
+            row = dict(row.items())
+        if not isinstance(row, dict):
+            return {"value": self.cell(row)}
+
+        cells = {}
+        for key, value in row.items():
+            if isinstance(value, iterdict):
+                value = dict(value.items())
+            if isinstance(value, dict):
+                cells.update(self.flatten(value, "{0}{1}.".format(prefix, key)))
+            else:
+                cells[prefix + str(key)] = self.cell(value)
+        return cells
+
+    def cell(self, value):
+        if value is None or type(value) in self.native_types:
+            return value
+        elif isinstance(value, (list, tuple, dict)) or is_lazy(value):
+            return encode_json(value, self.json_encoder).decode("utf-8")
+        return self.cell(self.default(value))
+
+    def write_batch(self, writer, batch, metadata):
+        if writer is None:
+            writer = self.get_writer(self.get_columns(batch), batch, metadata)
+        return writer, (writer.write(batch) if batch else b"")
+
+    def iterrender(self, data):
+        rows, metadata = split_rows(data)
+        batch_size = self.get_batch_size()
+        if isinstance(rows, (list, tuple)):
+            yield from self.write_rows([self.flatten(row) for row in rows], metadata)
+            return
+
+        writer, batch = None, []
+        for row in rows:
+            batch.append(self.flatten(row))
+            if len(batch) >= batch_size:
+                writer, content = self.write_batch(writer, batch, metadata)
+                batch = []
+                yield content
+        writer, content = self.write_batch(writer, batch, metadata)
+        yield content
+        yield writer.close()
+
+    def write_rows(self, rows, metadata):
+        # All the rows go into making the writer, so e.g. the types of
+        # Arrow columns fit the values of every batch.
+        writer = self.get_writer(self.get_columns(rows), rows, metadata)
+        batch_size = self.get_batch_size()
+        for start in range(0, len(rows), batch_size):
+            yield writer.write(rows[start : start + batch_size])
+        yield writer.close()
+
+    async def aiterrender(self, data):
+        rows, metadata = split_rows(data)
+        if not is_async_iterable(rows):
+            for content in self.iterrender(data):
+                yield content
+            return
+
+        writer, batch, batch_size = None, [], self.get_batch_size()
+        async for row in rows:
+            batch.append(self.flatten(row))
+            if len(batch) >= batch_size:
+                writer, content = self.write_batch(writer, batch, metadata)
+                batch = []
+                yield content
+        writer, content = self.write_batch(writer, batch, metadata)
+        yield content
+        yield writer.close()
+
+
+# Spreadsheets run cells starting with these as formulas.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+NUMBER = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\Z")
+
+
+class CSVWriter(object):
+    def __init__(self, columns, dialect):
+        self.buffer = io.StringIO()
+        self.writer = csv.DictWriter(
+            self.buffer, columns, dialect=dialect, extrasaction="ignore"
+        )
+        if columns:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        return self.drain()
+
+    def drain(self):
+        content = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return content.encode("utf-8")
+
+    def close(self):
+        return self.drain()
+
+
+class CSVRenderer(TabularRenderer):
+    """
+    Renders CSV, with a header row. Metadata (e.g. pagination) is left out.
+
+    Text that spreadsheets would run as a formula (starting with ``=``,
+    ``+``, ``-``, ``@``, a tab or a carriage return, and not a number) is
+    prefixed with a ``'``, unless ``escape_formulas`` is False.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+    dialect = "excel"
+    escape_formulas = True
+
+    def cell(self, value):
+        value = super().cell(value)
+        if (
+            self.escape_formulas
+            and isinstance(value, str)
+            and value.startswith(FORMULA_PREFIXES)
+            and not NUMBER.match(value)
+        ):
+            return "'" + value
+        return value
+
+    def get_writer(self, columns, batch, metadata):
+        return CSVWriter(columns, self.dialect)
+
+
+class ArrowSink(object):
+    """
+    A file-like object that Arrow writers write to, which keeps what's been
+    written until it's drained.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        content = b"".join(self.chunks)
+        self.chunks = []
+        return content
+
+
+class ArrowWriter(object):
+    """
+    Writes rows to an Arrow ``writer_class`` (a stream or Parquet writer),
+    with the schema inferred from the first batch.
+    """
+
+    def __init__(self, writer_class, columns, batch, metadata, json_encoder):
+        # Columns that are all null in the first batch, or hold values of
+        # different types, can't be typed, so they're strings.
+        self.string_columns = set()
+        fields = []
+        for column in columns:
+            try:
+                data_type = pyarrow.array([row.get(column) for row in batch]).type
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                data_type = pyarrow.null()
+            if pyarrow.types.is_null(data_type) or pyarrow.types.is_string(data_type):
+                data_type = pyarrow.string()
+                self.string_columns.add(column)
+            elif pyarrow.types.is_decimal(data_type):
+                # With room for the values of later batches.
+                data_type = pyarrow.decimal128(38, data_type.scale)
+            fields.append(pyarrow.field(column, data_type))
+        if metadata:
+            metadata = {"meta": encode_json(metadata, json_encoder)}
+        self.schema = pyarrow.schema(fields, metadata=metadata or None)
+        self.sink = ArrowSink()
+        self.writer = writer_class(self.sink, self.schema)
+
+    def write(self, rows):
+        if self.string_columns:
+            rows = [self.stringify(row) for row in rows]
+        self.writer.write_batch(
+            pyarrow.RecordBatch.from_pylist(rows, schema=self.schema)
+        )
+        return self.sink.drain()
+
+    def stringify(self, row):
+        for column in self.string_columns:
+            value = row.get(column)
+            if value is not None and not isinstance(value, str):
+                row[column] = str(value)
+        return row
+
+    def close(self):
+        self.writer.close()
+        return self.sink.drain()
+
+
+class ArrowRenderer(TabularRenderer):
+    """
+    Renders the Arrow IPC streaming format, which needs the pyarrow package.
+    Each batch of rows is a record batch, and metadata (e.g. pagination) is
+    the JSON ``meta`` key of the schema's metadata. Column types are
+    inferred from the rows, or only from the first batch of lazy rows, in
+    which case values of other types in later batches (other than in text
+    columns) end the stream with an error.
+    """
+
+    media_type = "application/vnd.apache.arrow.stream"
+    format = "arrow"
+    available = pyarrow is not None
+    native_types = TabularRenderer.native_types + (
+        decimal.Decimal,
+        datetime.datetime,
+        datetime.date,
+        datetime.time,
+        datetime.timedelta,
+        bytes,
+    )
+
+    def get_writer_class(self):
+        return pyarrow.ipc.new_stream
+
+    def get_writer(self, columns, batch, metadata):
+        return ArrowWriter(
+            self.get_writer_class(), columns, batch, metadata, self.json_encoder
+        )
+
+
+class ParquetRenderer(ArrowRenderer):
+    """
+    Renders Parquet, which needs the pyarrow package. Each batch of rows is
+    a row group, and written out as soon as it's encoded.
+    """
+
+    media_type = "application/vnd.apache.parquet"
+    format = "parquet"
+
+    def get_writer_class(self):
+        return pyarrow.parquet.ParquetWriter
+
+
+def parse_accept(accept):
+    """
+    Returns the media ranges of an Accept header value, with their
+    quality, best first.
+    """
+    ranges = []
+    for index, item in enumerate(accept.split(",")):
+        media_range, _, params = item.partition(";")
+        media_range = media_range.strip().lower()
+        if not media_range:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((-quality, index, media_range))
+    return [(media_range, -quality) for quality, index, media_range in sorted(ranges)]
+
+
+def negotiate_renderer(accept, renderers, format=None):
+    """
+    Returns the renderer class (of the ``renderers``, by media type) asked
+    for by ``format`` (a short name or media type, e.g. from a query
+    parameter), or else the one that best matches the Accept header value.
+    Falls back to the first one if nothing matches, rather than responding
+    406 Not Acceptable.
+    """
+    renderers = {
+        media_type: renderer
+        for media_type, renderer in renderers.items()
+        if renderer.available
+    }
+    default = next(iter(renderers.values()))
+
+    if format:
+        for media_type, renderer in renderers.items():
+            if format in (media_type, renderer.format):
+                return renderer
+
+    for media_range, quality in parse_accept(accept or ""):
+        if quality <= 0:
+            continue
+        if media_range in renderers:
+            return renderers[media_range]
+        main_type = media_range.split("/")[0]
+        for media_type, renderer in renderers.items():
+            if media_range == "*/*" or (
+                media_range == main_type + "/*"
+                and media_type.startswith(main_type + "/")
+            ):
+                return renderer
+    return default
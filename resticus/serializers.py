@@ -1,69 +1,459 @@
 import builtins
-import json
 
+from django.contrib.gis.db.models.fields import GeometryField
 from django.contrib.gis.geos import GEOSGeometry
 from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist
 from django.db import models
 from django.utils.functional import cached_property
 
-__all__ = ["serialize", "flatten"]
+from .iterators import iterate_queryset
+from .settings import api_settings
 
+__all__ = ["serialize", "flatten", "compile_plan", "geometry_to_geojson"]
 
-def serialize_model(
-    instance, fields=None, include=None, exclude=None, fixup=None, request=None
-):
-    def getfield(name):
+
+PLAN_CACHE_SIZE = 1024
+
+# GeoJSON has no LinearRing type; GDAL writes them as LineStrings.
+GEOJSON_TYPES = {"LinearRing": "LineString"}
+
+_plan_cache = {}
+
+
+def geometry_to_geojson(geometry, precision=None):
+    """
+    Convert a GEOSGeometry to a GeoJSON geometry dict, reading coordinates
+    straight from GEOS rather than round-tripping them through GDAL's JSON
+    output. If ``precision`` is given, coordinates are rounded to that many
+    decimal places.
+    """
+    geom_type = geometry.geom_type
+    if geom_type == "GeometryCollection":
+        return {
+            "type": geom_type,
+            "geometries": [geometry_to_geojson(g, precision) for g in geometry],
+        }
+
+    coordinates = () if geometry.empty else geometry.coords
+    if precision is not None:
+        coordinates = _round_coordinates(coordinates, precision)
+    return {"type": GEOJSON_TYPES.get(geom_type, geom_type), "coordinates": coordinates}
+
+
+def _round_coordinates(coordinates, precision):
+    if coordinates and isinstance(coordinates[0], tuple):
+        return tuple(_round_coordinates(c, precision) for c in coordinates)
+    return tuple(round(c, precision) for c in coordinates)
+
+
+def _freeze(spec):
+    """Turn a (possibly nested) field spec into a hashable cache key."""
+    if isinstance(spec, (list, tuple)):
+        return tuple(_freeze(item) for item in spec)
+    if isinstance(spec, dict):
+        return (dict, tuple(sorted((k, _freeze(v)) for k, v in spec.items())))
+    return spec
+
+
+def _get_model_field(model, name):
+    try:
+        return model._meta.concrete_model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _is_plain_column(model_field):
+    """
+    Whether the field's value is the raw column value, with no conversion
+    needed on serialization.
+    """
+    return (
+        model_field is not None
+        and model_field.concrete
+        and not model_field.many_to_many
+        and not isinstance(model_field, (models.FileField, GeometryField))
+    )
+
+
+def _prefix_lookup(prefix, lookup):
+    if isinstance(lookup, models.Prefetch):
+        return models.Prefetch(
+            f"{prefix}__{lookup.prefetch_through}", queryset=lookup.queryset
+        )
+    return f"{prefix}__{lookup}"
+
+
+def _join_columns(model_field):
+    """
+    Fields of the related model that prefetching ``model_field`` needs to
+    match related objects to their instances, or None if unknown.
+    """
+    if model_field.many_to_many:
+        return []
+    if isinstance(model_field, models.ManyToOneRel):
+        return [model_field.field.name]
+    return None
+
+
+def _reads_instances(options):
+    """Whether a nested spec hands whole instances to user code."""
+    return options.get("fixup") is not None or options.get("filter") is not None
+
+
+def _attribute_accessor(attname):
+    def accessor(instance, request):
         try:
-            return instance._meta.concrete_model._meta.get_field(name)
-        except FieldDoesNotExist:
+            value = getattr(instance, attname)
+        except ObjectDoesNotExist:
             return None
+        if isinstance(value, GEOSGeometry):
+            return geometry_to_geojson(value, api_settings.GEOJSON_PRECISION)
+        elif isinstance(value, models.Manager):
+            return [item.pk for item in value.all()]
+        return value
 
-    if fields is None:
-        fields = [
-            field.name for field in instance._meta.concrete_model._meta.local_fields
-        ]
-    else:
-        fields = list(fields)
-
-    if exclude is not None:
-        fields = [f for f in fields if f not in exclude]
-
-    if include is not None:
-        for attr in include:
-            if isinstance(attr, tuple) or (isinstance(attr, str)):
-                fields.append(attr)
-
-    data = {}
-    for field in fields:
-        if isinstance(field, str):
-            model_field = getfield(field)
-            try:
-                value = getattr(
-                    instance, model_field and getattr(model_field, "attname", None) or field
+    return accessor
+
+
+def _concrete_accessor(attname):
+    def accessor(instance, request):
+        return getattr(instance, attname)
+
+    return accessor
+
+
+def _file_accessor(attname):
+    def accessor(instance, request):
+        value = getattr(instance, attname)
+        value = value.url if value else None
+        if value is not None and request is not None:
+            value = request.build_absolute_uri(value)
+        return value
+
+    return accessor
+
+
+def _geometry_accessor(attname):
+    def accessor(instance, request):
+        value = getattr(instance, attname)
+        if value is None:
+            return None
+        return geometry_to_geojson(value, api_settings.GEOJSON_PRECISION)
+
+    return accessor
+
+
+def _callable_accessor(func):
+    def accessor(instance, request):
+        return func(instance)
+
+    return accessor
+
+
+def _related_accessor(name, options):
+    plans = {}
+
+    def accessor(instance, request):
+        try:
+            value = getattr(instance, name)
+        except ObjectDoesNotExist:
+            return None
+        return _serialize(value, plans=plans, **options)
+
+    return accessor
+
+
+class SerializationPlan:
+    """
+    Precomputed accessors for serializing instances of a single model with
+    a given field spec. Field lookups and type checks happen once, when the
+    plan is compiled, so that serializing an instance only pulls values.
+    Use :py:func:`compile_plan` to get a (cached) plan.
+    """
+
+    def __init__(self, model, fields=None, include=None, exclude=None):
+        self.model = model
+
+        if fields is None:
+            fields = [
+                field.name for field in model._meta.concrete_model._meta.local_fields
+            ]
+        else:
+            fields = list(fields)
+
+        if exclude is not None:
+            fields = [f for f in fields if f not in exclude]
+
+        if include is not None:
+            for attr in include:
+                if isinstance(attr, tuple) or (isinstance(attr, str)):
+                    fields.append(attr)
+
+        self.accessors = []
+        # Names to pass to QuerySet.values() if every field is a plain column,
+        # otherwise None.
+        self.values_fields = []
+        # Names to pass to QuerySet.only(), or None if the plan reads
+        # attributes that can't be traced back to columns.
+        self.only_fields = []
+        # Relations serialized as lists of primary keys, and relations
+        # serialized recursively, as (model field, options) pairs.
+        self.related_managers = []
+        self.related_specs = []
+        # The keys of the output, with the (model field, options) of nested
+        # objects, or None if values of some keys can't be told from the spec.
+        self.column_specs = []
+        for field in fields:
+            if isinstance(field, str):
+                accessor = self.compile_field(field)
+                model_field = _get_model_field(model, field)
+                if model_field is None or isinstance(model_field, GeometryField):
+                    self.column_specs = None
+                elif model_field.one_to_one and not model_field.concrete:
+                    self.column_specs = None
+                self.add_column_spec(field)
+                if _is_plain_column(model_field):
+                    self.add_values_field(field)
+                else:
+                    self.values_fields = None
+
+                if model_field is None:
+                    self.only_fields = None
+                elif model_field.many_to_many or model_field.one_to_many:
+                    self.related_managers.append(model_field)
+                elif model_field.concrete:
+                    self.add_only_field(field)
+                elif not model_field.one_to_one:
+                    # E.g. generic foreign keys, which read other columns.
+                    self.only_fields = None
+            elif isinstance(field, tuple):
+                key, value = field
+                self.values_fields = None
+                if callable(value):
+                    accessor = _callable_accessor(value)
+                    self.only_fields = None
+                    self.column_specs = None
+                elif isinstance(value, dict):
+                    accessor = _related_accessor(key, value)
+                    model_field = _get_model_field(model, key)
+                    if model_field is not None and model_field.is_relation:
+                        self.related_specs.append((model_field, value))
+                        if model_field.concrete:
+                            self.add_only_field(key)
+                        if model_field.related_model is None or _reads_instances(value):
+                            self.column_specs = None
+                        elif model_field.many_to_one or model_field.one_to_one:
+                            self.add_column_spec(key, (model_field, value))
+                        else:
+                            self.add_column_spec(key)
+                    else:
+                        self.only_fields = None
+                        self.column_specs = None
+                else:
+                    continue
+                field = key
+            else:
+                continue
+            self.accessors.append((field, accessor))
+
+    def add_values_field(self, name):
+        if self.values_fields is not None:
+            self.values_fields.append(name)
+
+    def add_only_field(self, name):
+        if self.only_fields is not None:
+            self.only_fields.append(name)
+
+    def add_column_spec(self, key, nested=None):
+        if self.column_specs is not None:
+            self.column_specs.append((key, nested))
+
+    def compile_field(self, name):
+        model_field = _get_model_field(self.model, name)
+        attname = model_field and getattr(model_field, "attname", None) or name
+
+        if isinstance(model_field, models.FileField):
+            return _file_accessor(attname)
+        elif isinstance(model_field, GeometryField):
+            return _geometry_accessor(attname)
+        elif _is_plain_column(model_field):
+            return _concrete_accessor(attname)
+        return _attribute_accessor(attname)
+
+    def related_lookups(self, only=False):
+        """
+        Return the ``(select_related, prefetch_related)`` lookups that load
+        every relation this plan (and the plans nested in it) will traverse,
+        so serializing a QuerySet doesn't run a query per instance. If
+        ``only`` is set, prefetched querysets only load the columns read.
+        """
+        select, prefetch = [], []
+
+        for model_field in self.related_managers:
+            join_columns = _join_columns(model_field)
+            if only and join_columns is not None:
+                queryset = model_field.related_model._default_manager.only(
+                    "pk", *join_columns
                 )
-            except ObjectDoesNotExist:
-                value = None
-            if isinstance(model_field, models.FileField):
-                value = value.url if value else None
-                if value is not None and request is not None:
-                    value = request.build_absolute_uri(value)
-                data[field] = value
-            elif isinstance(value, GEOSGeometry):
-                # TODO: How to tap into this and get the pre-JSON data structure?
-                data[field] = json.loads(value.geojson)
-            elif isinstance(value, models.Manager):
-                data[field] = [item.pk for item in value.all()]
+                prefetch.append(models.Prefetch(model_field.name, queryset=queryset))
             else:
-                data[field] = value
-        elif isinstance(field, tuple):
-            key, value = field
-            if callable(value):
-                data[key] = value(instance)
-            elif isinstance(value, dict):
-                try:
-                    data[key] = serialize(getattr(instance, key), **value)
-                except ObjectDoesNotExist:
-                    data[key] = None
+                prefetch.append(model_field.name)
+
+        for model_field, options in self.related_specs:
+            name = model_field.name
+            related_model = model_field.related_model
+            if related_model is None:
+                # Generic foreign keys can only be prefetched.
+                prefetch.append(name)
+                continue
+
+            nested = compile_plan(
+                related_model,
+                options.get("fields"),
+                options.get("include"),
+                options.get("exclude"),
+            )
+            nested_select, nested_prefetch = nested.related_lookups(only)
+
+            if model_field.many_to_one or model_field.one_to_one:
+                select.append(name)
+                select.extend(f"{name}__{lookup}" for lookup in nested_select)
+                prefetch.extend(
+                    _prefix_lookup(name, lookup) for lookup in nested_prefetch
+                )
+            else:
+                queryset = related_model._default_manager.all()
+                if nested_select:
+                    queryset = queryset.select_related(*nested_select)
+                if nested_prefetch:
+                    queryset = queryset.prefetch_related(*nested_prefetch)
+                if only and not _reads_instances(options):
+                    nested_only = nested.only_lookups()
+                    join_columns = _join_columns(model_field)
+                    if nested_only is not None and join_columns is not None:
+                        queryset = queryset.only(*nested_only, *join_columns)
+                prefetch.append(models.Prefetch(name, queryset=queryset))
+
+        return select, prefetch
+
+    def related_models(self):
+        """
+        Return the set of related models this plan (and the plans nested in
+        it) reads instances or primary keys of.
+        """
+        related = set()
+        for model_field in self.related_managers:
+            related.add(model_field.related_model)
+
+        for model_field, options in self.related_specs:
+            related_model = model_field.related_model
+            if related_model is None:
+                continue
+            related.add(related_model)
+            nested = compile_plan(
+                related_model,
+                options.get("fields"),
+                options.get("include"),
+                options.get("exclude"),
+            )
+            related.update(nested.related_models())
+        return related
+
+    def only_lookups(self):
+        """
+        Return the lookups to pass to ``QuerySet.only()`` so that only the
+        columns this plan (and the plans of select_related relations) read
+        are loaded, or None if the plan needs every column.
+        """
+        if self.only_fields is None:
+            return None
+
+        lookups = list(self.only_fields)
+        for model_field, options in self.related_specs:
+            if not model_field.concrete or _reads_instances(options):
+                continue
+            nested = compile_plan(
+                model_field.related_model,
+                options.get("fields"),
+                options.get("include"),
+                options.get("exclude"),
+            )
+            nested_only = nested.only_lookups()
+            if nested_only is not None:
+                lookups.extend(
+                    f"{model_field.name}__{lookup}" for lookup in nested_only
+                )
+        return lookups
+
+    def columns(self):
+        """
+        Return the columns of the output flattened into a table, i.e. its
+        keys, with nested objects' prefixed by their path (``author.name``),
+        or None if the values of some keys can't be told from the spec
+        (such as callables and attributes that aren't fields).
+        """
+        if self.column_specs is None:
+            return None
+
+        columns = []
+        for key, nested in self.column_specs:
+            if nested is None:
+                columns.append(key)
+                continue
+            model_field, options = nested
+            nested_columns = compile_plan(
+                model_field.related_model,
+                options.get("fields"),
+                options.get("include"),
+                options.get("exclude"),
+            ).columns()
+            if nested_columns is None:
+                return None
+            columns.extend(f"{key}.{column}" for column in nested_columns)
+        return columns
+
+    def __call__(self, instance, request=None):
+        data = {}
+        for key, accessor in self.accessors:
+            data[key] = accessor(instance, request)
+        return data
+
+
+def compile_plan(model, fields=None, include=None, exclude=None):
+    """
+    Return the :py:class:`SerializationPlan` for the given model and field
+    spec. Plans are cached per process; specs that can't be hashed (or that
+    hold values which can't) are compiled on every call.
+    """
+    try:
+        key = (model, _freeze(fields), _freeze(include), _freeze(exclude))
+        plan = _plan_cache.get(key)
+    except TypeError:
+        return SerializationPlan(model, fields, include, exclude)
+
+    if plan is None:
+        plan = SerializationPlan(model, fields, include, exclude)
+        if len(_plan_cache) >= PLAN_CACHE_SIZE:
+            # Specs built on the fly (e.g. with fresh lambdas on every call)
+            # would otherwise grow the cache without bound.
+            _plan_cache.clear()
+        _plan_cache[key] = plan
+    return plan
+
+
+def serialize_model(
+    instance,
+    fields=None,
+    include=None,
+    exclude=None,
+    fixup=None,
+    request=None,
+    plan=None,
+):
+    if plan is None:
+        plan = compile_plan(instance.__class__, fields, include, exclude)
+
+    data = plan(instance, request)
 
     if fixup:
         data = fixup(instance, data)
@@ -72,7 +462,14 @@ def serialize_model(
 
 
 def serialize(
-    src, fields=None, include=None, exclude=None, fixup=None, request=None, filter=None
+    src,
+    fields=None,
+    include=None,
+    exclude=None,
+    fixup=None,
+    request=None,
+    filter=None,
+    chunk_size=None,
 ):
     """Serialize Model or a QuerySet instance to Python primitives.
     By default, all the model fields (and only the model fields) are
@@ -123,10 +520,61 @@ def serialize(
     od dicts (if a QuerySet was serialized) with the serialized data. The
     data returned is suitable for JSON serialization using Django's JSON
     serializator.
+
+    If `chunk_size` is given, a QuerySet is serialized lazily: a generator
+    is returned instead of a list, and rows are fetched from the database
+    `chunk_size` at a time as the generator is consumed.
     """
 
+    if chunk_size and isinstance(src, models.query.QuerySet):
+        plans = {}
+        return (
+            _serialize(
+                instance,
+                fields=fields,
+                include=include,
+                exclude=exclude,
+                fixup=fixup,
+                request=request,
+                plans=plans,
+            )
+            for instance in builtins.filter(filter, iterate_queryset(src, chunk_size))
+        )
+
+    return _serialize(
+        src,
+        fields=fields,
+        include=include,
+        exclude=exclude,
+        fixup=fixup,
+        request=request,
+        filter=filter,
+    )
+
+
+def _serialize(
+    src,
+    fields=None,
+    include=None,
+    exclude=None,
+    fixup=None,
+    request=None,
+    filter=None,
+    plans=None,
+):
+    # ``plans`` memoizes the compiled plan per model for this field spec, so
+    # that the plan cache is only consulted once per model, not per instance.
+    if plans is None:
+        plans = {}
+
     def subs(subsrc):
-        return serialize(
+        if isinstance(subsrc, models.Model):
+            model = subsrc.__class__
+            plan = plans.get(model)
+            if plan is None:
+                plan = plans[model] = compile_plan(model, fields, include, exclude)
+            return serialize_model(subsrc, fixup=fixup, request=request, plan=plan)
+        return _serialize(
             subsrc,
             fields=fields,
             include=include,
@@ -134,6 +582,7 @@ def serialize(
             fixup=fixup,
             request=request,
             filter=filter,
+            plans=plans,
         )
 
     if isinstance(src, models.Manager):
@@ -146,14 +595,7 @@ def serialize(
         return dict((key, subs(value)) for key, value in src.items())
 
     elif isinstance(src, models.Model):
-        return serialize_model(
-            src,
-            fields=fields,
-            include=include,
-            exclude=exclude,
-            fixup=fixup,
-            request=request,
-        )
+        return subs(src)
 
     else:
         return src
@@ -192,6 +634,7 @@ class Serializer:
         fixup=None,
         request=None,
         filter=None,
+        chunk_size=None,
     ):
         self.source = source
         self.fields = fields or self.fields
@@ -200,11 +643,64 @@ class Serializer:
         self.fixup = fixup or self.fixup
         self.request = request
         self.filter = filter or self.filter
+        self.chunk_size = chunk_size
 
     @cached_property
     def data(self):
         return self.serialize()
 
+    @classmethod
+    def is_declarative(cls):
+        """
+        Whether the output is fully described by the field spec, i.e. no
+        fixup, filter or overridden hook gets to see the instances.
+        """
+        return (
+            cls.fixup is None
+            and cls.filter is None
+            and cls.serialize is Serializer.serialize
+            and cls.handle_fixup is Serializer.handle_fixup
+        )
+
+    def values(self):
+        """
+        Serialize a QuerySet straight from ``QuerySet.values()``, without
+        building model instances. Returns None if the source isn't a
+        QuerySet, or if the field spec, fixup or filter need the instances.
+        With a ``chunk_size``, rows are generated lazily.
+        """
+        if (
+            not isinstance(self.source, models.QuerySet)
+            or self.fixup is not None
+            or self.filter is not None
+            or not self.is_declarative()
+        ):
+            return None
+
+        plan = compile_plan(self.source.model, self.fields, self.include, self.exclude)
+        if plan.values_fields is None:
+            return None
+        queryset = self.source.values(*plan.values_fields)
+        if self.chunk_size:
+            return queryset.iterator(chunk_size=self.chunk_size)
+        return list(queryset)
+
+    def columns(self):
+        """
+        Return the columns of the serialized rows, flattened into a table
+        (see SerializationPlan.columns()), or None if they can't be told
+        from the field spec, or the source isn't a QuerySet or instance.
+        """
+        if self.fixup is not None or not self.is_declarative():
+            return None
+        if isinstance(self.source, models.QuerySet):
+            model = self.source.model
+        elif isinstance(self.source, models.Model):
+            model = type(self.source)
+        else:
+            return None
+        return compile_plan(model, self.fields, self.include, self.exclude).columns()
+
     def handle_fixup(self, instance, data):
         if self.fixup is not None:
             return self.fixup(instance, data)
@@ -219,4 +715,5 @@ class Serializer:
             fixup=self.handle_fixup,
             request=self.request,
             filter=self.filter,
+            chunk_size=self.chunk_size,
         )
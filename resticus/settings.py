@@ -16,18 +16,80 @@ DEFAULTS = {
     "JSON_ENCODER": "resticus.encoders.JSONEncoder",
     "LOGIN_REQUIRED": False,
     "TOKEN_MODEL": None,
+    "HASHED_TOKEN_MODEL": "resticus.HashedToken",
+    # Seconds between writes of token last-used times (None disables them)
+    "TOKEN_LAST_USED_INTERVAL": 60,
+    # Credential caching (cache aliases; None disables caching)
+    "TOKEN_CACHE": None,
+    "BASIC_AUTH_CACHE": None,
+    "CREDENTIAL_CACHE_TIMEOUT": 300,
+    "CREDENTIAL_CACHE_LOCAL_SIZE": 1024,
+    "CREDENTIAL_CACHE_LOCAL_TIMEOUT": 10,
     "DATA_PARSERS": {
         "application/json": "resticus.parsers.parse_json",
         "application/x-www-form-urlencoded": "resticus.parsers.parse_form_encoded",
         "multipart/form-data": "resticus.parsers.parse_multipart",
         "text/plain": "resticus.parsers.parse_plain_text",
+        "application/msgpack": "resticus.parsers.parse_msgpack",
+        "application/cbor": "resticus.parsers.parse_cbor",
     },
+    # Renderers by media type, negotiated with the Accept header. The first
+    # one is the default.
+    "RENDERERS": {
+        "application/json": "resticus.renderers.JSONRenderer",
+        "application/msgpack": "resticus.renderers.MessagePackRenderer",
+        "application/cbor": "resticus.renderers.CBORRenderer",
+        "application/x-ndjson": "resticus.renderers.NDJSONRenderer",
+        "text/csv": "resticus.renderers.CSVRenderer",
+        "application/vnd.apache.arrow.stream": "resticus.renderers.ArrowRenderer",
+        "application/vnd.apache.parquet": "resticus.renderers.ParquetRenderer",
+    },
+    # Query parameter that overrides the Accept header, e.g. ?format=ndjson
+    # (None to disable)
+    "FORMAT_QUERY_PARAM": "format",
     # Pagination
     "PAGINATE": True,
     "PAGE_SIZE": 100,
     "PAGE_QUERY_PARAM": "page",
     "PAGE_SIZE_QUERY_PARAM": None,
+    "CURSOR_QUERY_PARAM": "cursor",
     "MAX_PAGE_SIZE": 1000,
+    # How pages count objects: "exact", "none", "cached" or "estimate"
+    "PAGE_COUNT": "exact",
+    "PAGE_COUNT_CACHE": "default",
+    "PAGE_COUNT_CACHE_TIMEOUT": 60,
+    "PAGE_COUNT_ESTIMATE_THRESHOLD": 10000,
+    # Cache alias for endpoints with a response_cache_timeout
+    "RESPONSE_CACHE": "default",
+    # Largest response body to cache, in bytes (None for no limit)
+    "RESPONSE_CACHE_MAX_SIZE": 1024 * 1024,
+    # Modules of the installed apps imported at startup to find the cached
+    # endpoints, whose models are then watched for changes, e.g. ("views",)
+    # for processes which never import the URLconf (none by default)
+    "RESPONSE_CACHE_MODULES": (),
+    # Objects written per query by the bulk endpoints
+    "BULK_BATCH_SIZE": 1000,
+    # Streaming
+    "STREAMING_CHUNK_SIZE": 2000,
+    "STREAMING_BUFFER_SIZE": 64 * 1024,
+    # Compression of response bodies, negotiated with Accept-Encoding
+    "COMPRESSION": True,
+    # Content codings in order of preference ("br" needs brotli and
+    # "zstd" needs zstandard installed)
+    "COMPRESSION_ENCODINGS": ("br", "zstd", "gzip"),
+    "COMPRESSION_LEVELS": {"br": 4, "zstd": 3, "gzip": 6},
+    # Smallest (non-streamed) body to compress, in bytes
+    "COMPRESSION_MIN_SIZE": 1024,
+    "COMPRESSIBLE_TYPES": (
+        "application/json",
+        "application/msgpack",
+        "application/cbor",
+        "application/x-ndjson",
+        "application/vnd.apache.arrow.stream",
+        "text/",
+    ),
+    # Decimal places GeoJSON coordinates are rounded to (None to keep all)
+    "GEOJSON_PRECISION": None,
 }
 
 IMPORT_STRINGS = (
@@ -36,6 +98,7 @@ IMPORT_STRINGS = (
     "JSON_DECODER",
     "JSON_ENCODER",
     "DATA_PARSERS",
+    "RENDERERS",
     "ERROR_HANDLER",
 )
 
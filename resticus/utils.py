@@ -1,3 +1,8 @@
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.forms import models as model_forms
 from django_filters.constants import ALL_FIELDS
 
 try:
@@ -7,11 +12,51 @@ except ImportError:
     from django_filters.filterset import FilterSet
 
 __all__ = [
+    "call_async",
     "filterset_factory",
+    "memoize_factory",
+    "modelform_factory",
     "patch_form",
 ]
 
+FACTORY_CACHE_SIZE = 256
+
+
+def memoize_factory(factory):
+    """
+    Cache the classes ``factory(model, fields=...)`` builds, per model and
+    list of fields, so they're only built once per process. Calls with any
+    other arguments, or unhashable fields, aren't cached.
+    """
+    cache = {}
+
+    @functools.wraps(factory)
+    def wrapper(model, fields=None, **kwargs):
+        if fields is not None:
+            kwargs["fields"] = fields
+        if set(kwargs) - {"fields"}:
+            return factory(model, **kwargs)
+        try:
+            key = (model, tuple(fields) if isinstance(fields, list) else fields)
+            cls = cache.get(key)
+        except TypeError:
+            return factory(model, **kwargs)
+
+        if cls is None:
+            cls = factory(model, **kwargs)
+            if len(cache) >= FACTORY_CACHE_SIZE:
+                cache.clear()
+            cache[key] = cls
+        return cls
+
+    wrapper.cache = cache
+    return wrapper
 
+
+modelform_factory = memoize_factory(model_forms.modelform_factory)
+
+
+@memoize_factory
 def filterset_factory(model, fields=ALL_FIELDS):
     meta = type(str("Meta"), (object,), {"model": model, "fields": fields})
     filterset = type(
@@ -26,3 +71,13 @@ def patch_form(form):
             if field not in form.data and field not in form.files:
                 form.fields.pop(field)
     return form
+
+
+async def call_async(func, *args, **kwargs):
+    """
+    Call ``func`` from async code. Coroutine functions are awaited, other
+    callables are run in a thread, as they may block (e.g. on the database).
+    """
+    if asyncio.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    return await sync_to_async(func)(*args, **kwargs)
@@ -1,26 +1,99 @@
+import calendar
+import inspect
+
 import yaml
 
+from asgiref.sync import sync_to_async
+
 from django.conf import settings
 from django.contrib import auth
 from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import PermissionDenied, ValidationError
 from django.http import HttpResponse, StreamingHttpResponse, Http404
+from django.http.request import RawPostDataException
 
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
 from django.utils.translation import gettext as _
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 
-from . import exceptions, http
+from . import compression, exceptions, http
 from .auth import SessionAuth, TokenAuth
-from .compat import get_user_model
+from .cache import get_response_cache, watch_models
+from .compat import ASYNC_STREAMING, get_user_model, markcoroutinefunction
 from .parsers import parse_content_type
 from .permissions import AllowAny
+from .renderers import JSONRenderer, negotiate_renderer
 from .schemas import SchemaGenerator
 from .serializers import serialize
 from .settings import api_settings
 
-__all__ = ["Endpoint", "SessionAuthEndpoint", "TokenAuthEndpoint"]
+__all__ = ["Endpoint", "AsyncEndpoint", "SessionAuthEndpoint", "TokenAuthEndpoint"]
+
+
+class DispatchPlan(object):
+    """
+    The parts of request handling that only depend on the endpoint class
+    (and its as_view() arguments), worked out once instead of per request:
+    the authenticators and permissions, instantiated up front unless they
+    are stateful, the login_required flag of each method handler, and the
+    models whose changes invalidate cached responses.
+    """
+
+    def __init__(self, view_class, initkwargs=None):
+        initkwargs = initkwargs or {}
+
+        def option(name):
+            if name in initkwargs:
+                return initkwargs[name]
+            return getattr(view_class, name)
+
+        self.authentication_classes = option("authentication_classes")
+        self.permission_classes = option("permission_classes")
+        self.authenticators = [self.prepare(c) for c in self.authentication_classes]
+        self.permissions = [self.prepare(c) for c in self.permission_classes]
+
+        self.login_required = {}
+        for method in option("http_method_names"):
+            handler = getattr(view_class, method, None)
+            if handler is None and method == "head":
+                # View.setup() handles HEAD with get() if there's no head().
+                handler = getattr(view_class, "get", None)
+            self.login_required[method] = getattr(
+                handler, "login_required", option("login_required")
+            )
+
+        self.cache_models = ()
+        if option("response_cache_timeout") is not None:
+            view = view_class(**initkwargs)
+            self.cache_models = tuple(view.get_cache_models())
+            watch_models(self.cache_models, option("response_cache"))
+
+    @staticmethod
+    def prepare(cls):
+        # Stateless classes get a single instance, shared by all requests.
+        if getattr(cls, "stateful", True):
+            return cls
+        return cls()
+
+    @staticmethod
+    def instantiate(prepared):
+        return [item() if isinstance(item, type) else item for item in prepared]
+
+
+# Endpoint classes with a response_cache_timeout, in definition order.
+_cached_endpoints = []
+
+
+def watch_cached_endpoints():
+    """
+    Watches the models of the cached endpoints defined so far, so changes
+    invalidate their responses before any of them are used.
+    """
+    for view_class in _cached_endpoints:
+        watch_models(view_class().get_cache_models(), view_class.response_cache)
 
 
 class Endpoint(View):
@@ -41,13 +114,24 @@ class Endpoint(View):
       * request.params - a dictionary with GET parameters
       * request.data - a dictionary with POST/PUT parameters, as parsed from
           either form submission or submitted application/json data payload
-      * request.raw_data - string containing raw request body
+      * request.raw_data - bytes containing raw request body, read only after
+          the request is authenticated and permitted (None before that, and
+          for multipart requests, which are parsed straight from the stream)
+
+    Response bodies are compressed with the best content coding the client
+    accepts, unless ``compress`` is False.
+
+    GET responses are cached for ``response_cache_timeout`` seconds if it's
+    set, per path, query parameters and user (or for everyone, with
+    ``response_cache_scope = "public"``), until any of the models returned
+    by get_cache_models() change.
 
     The view method should return either a HTTPResponse (for example, a
     redirect), or something else (usually a dictionary or a list). If something
     other than HTTPResponse is returned, it is first serialized into
     :py:class:`resticus.http.JSONResponse` with a status code 200 (OK),
-    then returned.
+    then returned. Clients can ask for other formats (see ``renderers``)
+    with the Accept header.
 
     The authenticate method should return either a HttpResponse, which will
     shortcut the rest of the request handling (the view method will not be
@@ -62,11 +146,40 @@ class Endpoint(View):
     login_required = api_settings.LOGIN_REQUIRED
     permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
     data_parsers = api_settings.DATA_PARSERS
+    renderers = api_settings.RENDERERS
+    format_query_param = api_settings.FORMAT_QUERY_PARAM
+    # Methods whose request bodies are parsed into request.data
+    data_methods = ("POST", "PUT", "PATCH")
+
+    response_cache = api_settings.RESPONSE_CACHE
+    response_cache_timeout = None
+    response_cache_scope = "user"
+
+    compress = api_settings.COMPRESSION
 
     streaming = False
 
+    dispatch_plan = None
+
+    def __init_subclass__(cls, **kwargs):
+        super(Endpoint, cls).__init_subclass__(**kwargs)
+        if cls.response_cache_timeout is not None:
+            _cached_endpoints.append(cls)
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        if "dispatch_plan" not in initkwargs:
+            initkwargs["dispatch_plan"] = DispatchPlan(cls, initkwargs)
+        return super(Endpoint, cls).as_view(**initkwargs)
+
+    def get_dispatch_plan(self):
+        if self.dispatch_plan is None:
+            # Not created by as_view(), e.g. instantiated directly in tests.
+            self.dispatch_plan = DispatchPlan(type(self), vars(self))
+        return self.dispatch_plan
+
     def parse_body(self, request):
-        if request.method not in ["POST", "PUT", "PATCH"]:
+        if request.method not in self.data_methods:
             return (None, None)
 
         content_type, params = parse_content_type(request.content_type)
@@ -78,14 +191,19 @@ class Endpoint(View):
 
         return parser(request, **params)
 
+    def get_raw_data(self, request):
+        try:
+            return request.body
+        except RawPostDataException:
+            # The body was already consumed by the streaming multipart parser.
+            return None
+
     def authenticate(self, request):
         request.authenticator = None
 
-        try:
-            if request.user.is_authenticated:
-                return request.user
-        except AttributeError:
-            pass
+        user = self.get_request_user(request)
+        if user is not None:
+            return user
 
         for authenticator in self.get_authenticators():
             user = authenticator.authenticate(request)
@@ -93,9 +211,22 @@ class Endpoint(View):
                 request.authenticator = authenticator
                 return user
 
+        return self.unauthenticated(request)
+
+    def get_request_user(self, request):
+        """
+        Returns the user already authenticated by middleware, if any.
+        """
+        try:
+            if request.user.is_authenticated:
+                return request.user
+        except AttributeError:
+            pass
+
+    def unauthenticated(self, request):
         # User is not authenticated, so short circuit if login_required.
-        handler = getattr(self, request.method.lower(), None)
-        if getattr(handler, "login_required", self.login_required):
+        plan = self.get_dispatch_plan()
+        if plan.login_required.get(request.method.lower(), self.login_required):
             msg = _("You must be logged in to access this endpoint.")
             raise exceptions.AuthenticationFailed(msg)
 
@@ -103,9 +234,13 @@ class Endpoint(View):
 
     def get_authenticators(self):
         """
-        Instantiates and returns the list of authenticators that this view can use.
+        Returns the list of authenticators that this view can use.
         """
-        return [auth() for auth in self.authentication_classes]
+        plan = self.get_dispatch_plan()
+        if self.authentication_classes is not plan.authentication_classes:
+            # Changed on this instance after the plan was made.
+            return [auth() for auth in self.authentication_classes]
+        return plan.instantiate(plan.authenticators)
 
     def get_authenticate_header(self, request):
         """
@@ -118,9 +253,13 @@ class Endpoint(View):
 
     def get_permissions(self):
         """
-        Instantiates and returns the list of permissions that this view requires.
+        Returns the list of permissions that this view requires.
         """
-        return [permission() for permission in self.permission_classes]
+        plan = self.get_dispatch_plan()
+        if self.permission_classes is not plan.permission_classes:
+            # Changed on this instance after the plan was made.
+            return [permission() for permission in self.permission_classes]
+        return plan.instantiate(plan.permissions)
 
     def check_permissions(self, request):
         """
@@ -153,39 +292,174 @@ class Endpoint(View):
 
     @method_decorator(csrf_exempt)
     def dispatch(self, request, *args, **kwargs):
-        request.params = dict((k, v) for (k, v) in request.GET.items())
-        request.data = None
-        request.files = None
-        request.raw_data = request.body
+        self.initialize_request(request)
 
         try:
             request.user = self.authenticate(request)
             self.check_permissions(request)
-            request.data, request.files = self.parse_body(request)
-            response = super(Endpoint, self).dispatch(request, *args, **kwargs)
+            response = self.get_cached_response(request)
+            if response is None:
+                self.parse_request(request)
+                response = super(Endpoint, self).dispatch(request, *args, **kwargs)
+        except Exception as err:
+            response = self.handle_exception(err)
 
-        except Http404:
-            return http.Http404()
+        response = self.finalize_response(response)
+        response = self.cache_response(request, response)
+        return self.compress_response(request, response)
 
-        except exceptions.AuthenticationFailed as err:
-            response = self.authentication_failed(err)
+    def initialize_request(self, request):
+        request.params = dict((k, v) for (k, v) in request.GET.items())
+        request.data = None
+        request.files = None
+        request.raw_data = None
+        request.response_cache_key = None
+        request.etag = None
+        request.last_modified = None
+        request.renderer = self.get_renderer(request)
 
-        except ValidationError as err:
+    def get_renderer(self, request):
+        """
+        Returns the renderer for the response data, asked for with the
+        ``format_query_param``, or negotiated with the Accept header.
+        """
+        format = None
+        if self.format_query_param:
+            format = request.GET.get(self.format_query_param)
+        renderer_class = negotiate_renderer(
+            request.META.get("HTTP_ACCEPT"), self.renderers, format
+        )
+        return renderer_class()
+
+    def parse_request(self, request):
+        request.data, request.files = self.parse_body(request)
+        request.raw_data = self.get_raw_data(request)
+
+    def handle_exception(self, err):
+        if isinstance(err, Http404):
+            return http.Http404()
+        elif isinstance(err, exceptions.AuthenticationFailed):
+            return self.authentication_failed(err)
+        elif isinstance(err, ValidationError):
             return http.Http400(err.message)
+        elif isinstance(err, exceptions.APIException):
+            return self.api_exception(err)
+        return self.server_error(err)
 
-        except exceptions.APIException as err:
-            response = self.api_exception(err)
-
-        except Exception as err:
-            response = self.server_error(err)
-
+    def finalize_response(self, response):
         if not isinstance(response, (HttpResponse, StreamingHttpResponse)):
             if self.streaming:
                 response = self.streaming_response(response)
-            else:
+            elif type(self.request.renderer) is JSONRenderer:
                 response = http.Http200(response)
+            else:
+                response = http.RenderedResponse(response, self.request.renderer)
+            if len(self.renderers) > 1:
+                patch_vary_headers(response, ("Accept",))
+        if response.status_code == 200:
+            self.set_validators(self.request, response)
+        return response
+
+    def get_conditional_response(self, request, etag=None, last_modified=None):
+        """
+        Sets the validators (an ETag and/or a Last-Modified datetime) of the
+        response to the request. Returns a 304 Not Modified response if the
+        request's conditional headers match them (or 412 Precondition
+        Failed), otherwise None.
+        """
+        if etag is not None:
+            request.etag = quote_etag(etag)
+        if last_modified is not None:
+            request.last_modified = calendar.timegm(last_modified.utctimetuple())
+
+        response = get_conditional_response(
+            request, etag=request.etag, last_modified=request.last_modified
+        )
+        if response is not None:
+            self.set_validators(request, response)
         return response
 
+    def set_validators(self, request, response):
+        if request.etag is not None and not response.has_header("ETag"):
+            response["ETag"] = request.etag
+        if request.last_modified is not None and not response.has_header(
+            "Last-Modified"
+        ):
+            response["Last-Modified"] = http_date(request.last_modified)
+
+    def get_cache_models(self):
+        """
+        Returns the models whose changes invalidate cached responses.
+        """
+        return []
+
+    def get_cache_scope(self, request):
+        """
+        Returns who a cached response can be shared with: everyone, or only
+        the same user.
+        """
+        if self.response_cache_scope == "public":
+            return ""
+        elif request.user.is_authenticated:
+            return "user:{0}".format(request.user.pk)
+        return "anonymous"
+
+    def get_cached_response(self, request):
+        """
+        Returns the cached response to the request, if any. On a miss, the
+        key to cache the response under is set as request.response_cache_key.
+        """
+        if self.response_cache_timeout is None or request.method not in (
+            "GET",
+            "HEAD",
+        ):
+            return None
+
+        cache = get_response_cache(self.response_cache)
+        key = cache.make_key(
+            request.method,
+            request.path,
+            request.GET,
+            self.get_cache_scope(request),
+            self.get_dispatch_plan().cache_models,
+            variant=request.renderer.media_type,
+        )
+        response = cache.get(key)
+        if response is None:
+            request.response_cache_key = key
+            return None
+
+        # Cached responses carry their validators.
+        return get_conditional_response(
+            request,
+            etag=response.get("ETag"),
+            last_modified=parse_http_date_safe(response.get("Last-Modified")),
+            response=response,
+        )
+
+    def cache_response(self, request, response):
+        if (
+            request.response_cache_key is None
+            or response.status_code != 200
+            or response.cookies
+            or getattr(response, "async_content", None) is not None
+        ):
+            return response
+
+        cache = get_response_cache(self.response_cache)
+        return cache.set(
+            request.response_cache_key, response, self.response_cache_timeout
+        )
+
+    def compress_response(self, request, response):
+        """
+        Compresses the response body if the endpoint's compress flag is set
+        (see resticus.compression.compress_response()).
+        """
+        if not self.compress:
+            return response
+        return compression.compress_response(request, response)
+
     def authentication_failed(self, err):
         # WWW-Authenticate header for 401 responses, else coerce to 403
         auth_header = self.get_authenticate_header(self.request)
@@ -211,7 +485,102 @@ class Endpoint(View):
 
     def streaming_response(self, data, **kwargs):
         kwargs.setdefault("status", 200)
-        return http.StreamingJSONResponse(data, **kwargs)
+        renderer = self.request.renderer
+        if type(renderer) is JSONRenderer:
+            return http.StreamingJSONResponse(data, **kwargs)
+        return http.StreamingRenderedResponse(data, renderer, **kwargs)
+
+
+class AsyncEndpoint(Endpoint):
+    """
+    An :py:class:`Endpoint` for ASGI deployments, whose get(), post(), etc.
+    methods are coroutine functions.
+
+    Requests are authenticated and permitted through the async hooks of the
+    authenticators and permissions (aauthenticate(), ahas_permission()),
+    which run blocking implementations in a thread. Streamed responses can
+    be fed by async iterators.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return markcoroutinefunction(super(AsyncEndpoint, cls).as_view(**initkwargs))
+
+    @method_decorator(csrf_exempt)
+    async def dispatch(self, request, *args, **kwargs):
+        self.initialize_request(request)
+
+        try:
+            request.user = await self.aauthenticate(request)
+            await self.acheck_permissions(request)
+            response = None
+            if self.response_cache_timeout is not None:
+                response = await sync_to_async(self.get_cached_response)(request)
+            if response is None:
+                # ASGI requests are received in full before the view is
+                # called, so this doesn't wait on the client.
+                self.parse_request(request)
+                response = await self.ahandle(request, *args, **kwargs)
+        except Exception as err:
+            response = self.handle_exception(err)
+
+        response = self.finalize_response(response)
+        if getattr(response, "async_content", None) is not None and not ASYNC_STREAMING:
+            response = await response.aread()
+        if request.response_cache_key is not None:
+            response = await sync_to_async(self.cache_response)(request, response)
+        return self.compress_response(request, response)
+
+    async def ahandle(self, request, *args, **kwargs):
+        method = request.method.lower()
+        if method in self.http_method_names:
+            handler = getattr(self, method, self.http_method_not_allowed)
+        else:
+            handler = self.http_method_not_allowed
+
+        # options() and http_method_not_allowed() are plain functions.
+        response = handler(request, *args, **kwargs)
+        if inspect.isawaitable(response):
+            response = await response
+        return response
+
+    async def aauthenticate(self, request):
+        request.authenticator = None
+
+        if hasattr(request, "auser"):
+            # Django 5.0+
+            user = await request.auser()
+            if user.is_authenticated:
+                return user
+        elif hasattr(request, "user"):
+            # AuthenticationMiddleware loads the user lazily.
+            user = await sync_to_async(self.get_request_user)(request)
+            if user is not None:
+                return user
+
+        for authenticator in self.get_authenticators():
+            user = await authenticator.aauthenticate(request)
+            if user and user.is_authenticated:
+                request.authenticator = authenticator
+                return user
+
+        return self.unauthenticated(request)
+
+    async def acheck_permissions(self, request):
+        """
+        Async version of check_permissions().
+        """
+        for permission in self.get_permissions():
+            if not await permission.ahas_permission(request, self):
+                self.permission_denied(request)
+
+    async def acheck_object_permissions(self, request, obj):
+        """
+        Async version of check_object_permissions().
+        """
+        for perm in self.get_permissions():
+            if not await perm.ahas_object_permission(request, self, obj):
+                self.permission_denied(request)
 
 
 class SessionAuthEndpoint(Endpoint):
@@ -29,7 +29,7 @@ setup(
     packages=find_packages(exclude=['tests', 'tests.*']),
     include_package_data=True,
     install_requires=[
-        'Django>=2.2',
+        'Django>=3.1',
         'django-filter>=2.1.0',
         'pyyaml'
     ],
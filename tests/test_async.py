@@ -0,0 +1,79 @@
+import base64
+from django.test import AsyncClient, TestCase
+from django.urls import reverse
+from resticus.compat import json, get_user_model
+from .testapp.models import Author
+
+
+class TestAsyncEndpoint(TestCase):
+    client_class = AsyncClient
+
+    def setUp(self):
+        self.author = Author.objects.create(name='User Foo')
+        self.user = get_user_model().objects.create_user(
+            username='foo',
+            password='bar'
+        )
+
+    async def test_author_list(self):
+        """Exercise a GET request to an async list endpoint"""
+        r = await self.client.get(reverse('async_author_list'))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.content)['data'], [
+            {'id': self.author.id, 'name': 'User Foo'}])
+
+    async def test_create_author(self):
+        """Exercise a POST request to an async list endpoint"""
+        r = await self.client.post(reverse('async_author_list'),
+            data=json.dumps({'name': 'New User'}),
+            content_type='application/json')
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(json.loads(r.content)['data']['name'], 'New User')
+
+    async def test_author_details(self):
+        """Exercise GET, PUT and DELETE requests to an async detail endpoint"""
+        url = reverse('async_author_detail', args=[self.author.id])
+        r = await self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.content)['data']['name'], 'User Foo')
+
+        r = await self.client.put(url, data=json.dumps({'name': 'User Bar'}),
+            content_type='application/json')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.content)['data']['name'], 'User Bar')
+
+        r = await self.client.delete(url)
+        self.assertEqual(r.status_code, 204)
+
+        r = await self.client.get(url)
+        self.assertEqual(r.status_code, 404)
+
+    async def test_invalid_method(self):
+        r = await self.client.post(
+            reverse('async_author_detail', args=[self.author.id]),
+            data='{}', content_type='application/json')
+        self.assertEqual(r.status_code, 405)
+
+    async def test_basic_auth_challenge(self):
+        """Test that async endpoints issue the HTTP Basic Auth challenge"""
+        r = await self.client.get(reverse('async_basic_auth'))
+        self.assertEqual(r.status_code, 401)
+        self.assertEqual(r['WWW-Authenticate'], 'Basic realm="api"')
+
+    async def test_basic_auth_success(self):
+        """Test that async endpoints authenticate with HTTP Basic Auth"""
+        r = await self.client.get(reverse('async_basic_auth'),
+            authorization='Basic {0}'.format(
+                base64.b64encode(b'foo:bar').decode('ascii')))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.content), {'username': 'foo'})
+
+    async def test_async_iterator(self):
+        """Test that async iterators are streamed as JSON lists"""
+        r = await self.client.get(reverse('async_stream'))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(r.content), {
+            'data': [{'number': 0}, {'number': 1}, {'number': 2}],
+            'count': 3,
+        })
@@ -1,6 +1,13 @@
 import base64
-from django.test import TestCase
-from resticus.auth import TokenAuth
+from datetime import timedelta
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from resticus import exceptions
+from resticus.auth import HashedTokenAuth, TokenAuth
+from resticus.models import HashedToken, last_used
+from resticus.settings import api_settings
 from resticus.compat import json, get_user_model
 from .client import TestClient, debug
 from .testapp.models import Publisher, Author, Book
@@ -72,6 +79,28 @@ class TestAuth(TestCase):
         })
         self.assertEqual(r.status_code, 401)
 
+    def test_basic_auth_upload(self):
+        """Test that multipart uploads are streamed, not read into the body"""
+        r = self.client.post('basic_auth', data={
+            'upload': SimpleUploadedFile('upload.txt', b'data'),
+        }, extra={
+            'HTTP_AUTHORIZATION': 'Basic {0}'.format(
+                base64.b64encode(b'foo:bar').decode('ascii')),
+        })
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json['files'], ['upload'])
+        self.assertIsNone(r.json['raw_data'])
+        self.assertFalse(hasattr(r.wsgi_request, '_body'))
+
+    def test_basic_auth_upload_rejected(self):
+        """Test that the body of an unauthenticated request isn't read"""
+        r = self.client.post('basic_auth', data={
+            'upload': SimpleUploadedFile('upload.txt', b'data'),
+        })
+        self.assertEqual(r.status_code, 401)
+        self.assertFalse(hasattr(r.wsgi_request, '_body'))
+        self.assertFalse(r.wsgi_request._read_started)
+
     def test_token_auth_challenge(self):
         """Test that Token Auth challenge is issued"""
         r = self.client.get('token_auth')
@@ -108,3 +137,54 @@ class TestAuth(TestCase):
             'HTTP_AUTHORIZATION': 'Token faketoken'
         })
         self.assertEqual(r.status_code, 401)
+
+
+class TestHashedTokenAuth(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='foo',
+            password='bar'
+        )
+        self.token = HashedToken.objects.create(user=self.user)
+
+    def authenticate(self, key=None):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION='Token {0}'.format(
+            key or self.token.key))
+        return HashedTokenAuth().authenticate(request)
+
+    def test_key_is_not_stored(self):
+        token = HashedToken.objects.get(pk=self.token.pk)
+        self.assertIsNone(token.key)
+        self.assertEqual(token.prefix, self.token.key[:8])
+        self.assertNotIn(self.token.key, token.digest)
+
+    def test_hashed_token_auth_success(self):
+        self.assertEqual(self.authenticate(), self.user)
+
+    def test_hashed_token_auth_failure(self):
+        """Test that keys are compared in full, not just by prefix"""
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(self.token.key[:8] + 'x' * 32)
+
+    def test_expired_token(self):
+        self.token.expires = timezone.now() - timedelta(seconds=1)
+        self.token.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+        self.assertEqual(HashedToken.purge_expired()[0], 1)
+        self.assertFalse(HashedToken.objects.exists())
+
+    def test_last_used_is_written_in_bulk(self):
+        other = HashedToken.objects.create(user=self.user)
+        with mock.patch.object(api_settings, 'TOKEN_LAST_USED_INTERVAL', 3600):
+            self.authenticate()
+            self.authenticate()
+            self.authenticate(other.key)
+        self.token.refresh_from_db()
+        self.assertIsNone(self.token.last_used)
+
+        with self.assertNumQueries(1):
+            last_used.flush()
+        self.assertEqual(
+            HashedToken.objects.filter(last_used__isnull=False).count(), 2)
@@ -0,0 +1,283 @@
+import base64
+import time
+from unittest import mock
+from django.contrib import auth
+from django.core.cache import cache
+from django.db.models.deletion import Collector
+from django.db.models.signals import post_save
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from resticus import exceptions
+from resticus.auth import BasicHttpAuth, TokenAuth
+from resticus.cache import (CredentialCache, LocalCache, _credential_caches,
+    _watched_models, get_credential_cache, invalidate_user)
+from resticus.compat import get_user_model, json
+from resticus.settings import api_settings
+from resticus.views import watch_cached_endpoints
+from .testapp.models import Article, Author, Book, Publisher, Tag
+from .testapp.views import CachedBookList
+
+
+class TestLocalCache(TestCase):
+    def test_evicts_least_recently_used(self):
+        local = LocalCache(max_size=2, timeout=60)
+        local.set('a', 1)
+        local.set('b', 2)
+        local.get('a')
+        local.set('c', 3)
+        self.assertEqual(local.get('a'), 1)
+        self.assertIsNone(local.get('b'))
+        self.assertEqual(local.get('c'), 3)
+
+    def test_entries_expire(self):
+        local = LocalCache(max_size=2, timeout=60)
+        local.set('a', 1)
+        with mock.patch('time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(local.get('a'))
+
+    def test_discard(self):
+        local = LocalCache(max_size=3, timeout=60)
+        for key, value in [('a', 1), ('b', 2), ('c', 3)]:
+            local.set(key, value)
+        local.discard(lambda value: value % 2)
+        self.assertEqual(list(local.entries), ['b'])
+
+
+class TestTokenCache(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(api_settings, 'TOKEN_CACHE', 'default')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(_credential_caches.clear)
+        self.addCleanup(cache.clear)
+
+        self.user = get_user_model().objects.create_user(
+            username='foo',
+            password='bar'
+        )
+        self.token = TokenAuth.get_token_model().objects.create(user=self.user)
+
+    def authenticate(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION='Token {0}'.format(
+            self.token.key))
+        return TokenAuth().authenticate(request)
+
+    def test_token_lookups_are_cached(self):
+        """Test that a token is only looked up in the database once"""
+        self.assertEqual(self.authenticate(), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate(), self.user)
+
+    def test_shared_cache(self):
+        """Test that tokens are cached across processes (local tiers)"""
+        self.authenticate()
+        get_credential_cache('default').local.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate(), self.user)
+
+    def test_deleted_token_is_rejected(self):
+        self.authenticate()
+        self.token._meta.model.objects.filter(pk=self.token.pk).delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_token_is_rejected_by_other_processes(self):
+        """Test that tokens cached in other processes' local tiers are revoked"""
+        other = CredentialCache('default')
+        with mock.patch.dict(_credential_caches, {'default': other}):
+            self.authenticate()
+        # Deleting the instance would clear its key (the primary key).
+        self.token._meta.model.objects.filter(pk=self.token.pk).delete()
+        with mock.patch.dict(_credential_caches, {'default': other}):
+            with self.assertRaises(exceptions.AuthenticationFailed):
+                self.authenticate()
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_user_change_invalidates_shared_cache(self):
+        """Test that entries other processes cached are invalidated too"""
+        self.authenticate()
+        get_credential_cache('default').local.clear()
+        self.user.username = 'changed'
+        self.user.save()
+        self.assertEqual(self.authenticate().username, 'changed')
+
+    def test_login_does_not_invalidate(self):
+        self.authenticate()
+        self.user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+    def test_shared_invalidation_is_checked_on_local_hits(self):
+        """Test that users invalidated by other processes are rejected"""
+        self.authenticate()
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+        shared = get_credential_cache('default').cache
+        shared.set('resticus:user:{0}'.format(self.user.pk), 'changed')
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_bulk_update_needs_invalidation(self):
+        self.authenticate()
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+        invalidate_user(self.user.pk)
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_only_checked_fields_are_cached(self):
+        """Test that password hashes aren't stored in the cache"""
+        self.authenticate()
+        key = get_credential_cache('default').make_key('token', self.token.key)
+        pk, values, generation = cache.get(key)
+        self.assertEqual(pk, self.user.pk)
+        self.assertNotIn('password', values)
+        self.assertNotIn(self.user.password, repr(cache.get(key)))
+
+    def test_other_fields_are_loaded(self):
+        self.authenticate()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate().email, self.user.email)
+
+    def test_keys_are_digests(self):
+        key = get_credential_cache('default').make_key('token', self.token.key)
+        self.assertNotIn(self.token.key, key)
+
+
+class TestBasicAuthCache(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(api_settings, 'BASIC_AUTH_CACHE', 'default')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(_credential_caches.clear)
+        self.addCleanup(cache.clear)
+
+        self.user = get_user_model().objects.create_user(
+            username='foo',
+            password='bar'
+        )
+
+    def authenticate(self, credentials=b'foo:bar'):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION='Basic {0}'.format(
+            base64.b64encode(credentials).decode('ascii')))
+        return BasicHttpAuth().authenticate(request)
+
+    def test_verified_credentials_are_cached(self):
+        """Test that passwords are only checked once"""
+        with mock.patch('django.contrib.auth.authenticate',
+                wraps=auth.authenticate) as authenticate:
+            self.assertEqual(self.authenticate(), self.user)
+            with self.assertNumQueries(0):
+                self.assertEqual(self.authenticate(), self.user)
+        self.assertEqual(authenticate.call_count, 1)
+
+    def test_wrong_password_is_rejected(self):
+        self.authenticate()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(b'foo:baz')
+
+    def test_password_change_invalidates(self):
+        self.authenticate()
+        self.user.set_password('baz')
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+        self.assertEqual(self.authenticate(b'foo:baz'), self.user)
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+
+class TestResponseCache(TestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.author = Author.objects.create(name='User Foo')
+        self.publisher = Publisher.objects.create(name='User Foo')
+        self.book = self.author.books.create(title='Book', isbn='1234',
+            price='10.00', publisher=self.publisher)
+
+    def get(self, **params):
+        r = self.client.get(reverse('cached_book_list'), params)
+        self.assertEqual(r.status_code, 200)
+        content = b''.join(r.streaming_content) if r.streaming else r.content
+        return json.loads(content)['data']
+
+    def test_responses_are_cached(self):
+        """Test that repeated GETs are served from the cache"""
+        data = self.get()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(), data)
+
+    def test_query_params_are_keyed(self):
+        self.get()
+        with self.assertNumQueries(3):
+            self.get(page=1)
+
+    def test_model_change_invalidates(self):
+        self.get()
+        self.book.title = 'Changed'
+        self.book.save()
+        self.assertEqual(self.get()[0]['title'], 'Changed')
+
+    def test_related_change_invalidates(self):
+        """Test that changes of models in the field spec invalidate"""
+        self.get()
+        self.author.name = 'User Bar'
+        self.author.save()
+        self.assertEqual(self.get()[0]['author'], {'name': 'User Bar'})
+
+    def test_streamed_responses_are_cached(self):
+        """Test that streamed content is cached once it's been streamed"""
+        r = self.client.get(reverse('cached_book_list'))
+        self.assertTrue(r.streaming)
+        content = b''.join(r.streaming_content)
+        with self.assertNumQueries(0):
+            r = self.client.get(reverse('cached_book_list'))
+        self.assertEqual(r.content, content)
+
+    def test_large_responses_arent_cached(self):
+        with mock.patch.object(api_settings, 'RESPONSE_CACHE_MAX_SIZE', 10):
+            self.get()
+            with self.assertNumQueries(3):
+                self.get()
+
+    def test_head_requests_are_keyed(self):
+        """Test that responses of head() aren't served to GET requests"""
+        r = self.client.head(reverse('cached_book_list'))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.get()[0]['title'], 'Book')
+
+    def test_models_are_watched_at_startup(self):
+        """Test that models are watched without building the views"""
+        with mock.patch.dict(_watched_models, clear=True):
+            watch_cached_endpoints()
+            self.assertLessEqual({Book, Author, Tag}, set(_watched_models))
+
+    def test_unwatched_models_are_fast_deleted(self):
+        """Test that receivers are only connected for watched models"""
+        self.assertTrue(post_save.has_listeners(Book))
+        self.assertFalse(post_save.has_listeners(Article))
+        collector = Collector(using='default')
+        self.assertTrue(collector.can_fast_delete(Article.objects.all()))
+
+    def test_m2m_change_invalidates(self):
+        self.get()
+        tag = Tag.objects.create(name='Tag')
+        self.book.tags.add(tag)
+        self.assertEqual(self.get()[0]['tags'], [tag.id])
+
+    def test_users_dont_share_entries(self):
+        self.get()
+        get_user_model().objects.create_user(username='foo', password='bar')
+        self.client.login(username='foo', password='bar')
+        with self.assertNumQueries(5):
+            # Session, user, count, page and tags.
+            self.get()
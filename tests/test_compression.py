@@ -0,0 +1,90 @@
+import gzip
+import zlib
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from resticus.compat import json
+from resticus.compression import compress_response, negotiate_encoding
+from resticus.http import JSONResponse, StreamingJSONResponse
+from resticus.settings import api_settings
+from .testapp.models import Author, Publisher
+from .testapp.views import BookList
+
+
+class TestNegotiation(TestCase):
+    def test_preference_order(self):
+        """Test that the server's preference wins among accepted codings"""
+        self.assertEqual(negotiate_encoding('gzip, br', ['br', 'gzip']), 'br')
+        self.assertEqual(negotiate_encoding('gzip, br', ['gzip', 'br']), 'gzip')
+
+    def test_quality(self):
+        self.assertIsNone(negotiate_encoding('gzip;q=0', ['gzip']))
+        self.assertEqual(negotiate_encoding('br;q=0, *', ['br', 'gzip']), 'gzip')
+        self.assertIsNone(negotiate_encoding('', ['gzip']))
+        self.assertIsNone(negotiate_encoding('identity', ['gzip']))
+
+
+class TestCompression(TestCase):
+    def setUp(self):
+        publisher = Publisher.objects.create(name='Publisher')
+        author = Author.objects.create(name='Author')
+        for i in range(50):
+            author.books.create(title='Book %d' % i, isbn='isbn-%d' % i,
+                price=Decimal('10.0'), publisher=publisher)
+
+    def get(self, url_name, **extra):
+        return self.client.get(reverse(url_name), **extra)
+
+    def test_streamed_gzip(self):
+        """Test that streamed lists are compressed as they're encoded"""
+        r = self.get('book_list', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', r['Vary'])
+        data = json.loads(gzip.decompress(b''.join(r.streaming_content)))
+        self.assertEqual(len(data['data']), 50)
+
+    def test_streamed_chunks_are_flushed(self):
+        """Test that each compressed chunk can be decoded on arrival"""
+        with mock.patch.object(api_settings, 'STREAMING_BUFFER_SIZE', 512):
+            response = compress_response(
+                mock.Mock(META={'HTTP_ACCEPT_ENCODING': 'gzip'}),
+                StreamingJSONResponse({'data': ['x' * 100] * 20}))
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        decoded = []
+        for chunk in response.streaming_content:
+            decoded.append(decompressor.decompress(chunk))
+            self.assertTrue(decoded[-1] or decompressor.eof)
+        self.assertEqual(json.loads(b''.join(decoded)),
+            {'data': ['x' * 100] * 20})
+
+    def test_uncompressed_without_accept_encoding(self):
+        r = self.get('book_list')
+        self.assertFalse(r.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', r['Vary'])
+        data = json.loads(b''.join(r.streaming_content))
+        self.assertEqual(len(data['data']), 50)
+
+    def test_small_responses_are_not_compressed(self):
+        request = mock.Mock(META={'HTTP_ACCEPT_ENCODING': 'gzip'})
+        response = compress_response(request, JSONResponse({'data': []}))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        response = compress_response(request, JSONResponse({'data': ['x'] * 1000}))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content)),
+            {'data': ['x'] * 1000})
+
+    def test_etag_is_weakened(self):
+        request = mock.Mock(META={'HTTP_ACCEPT_ENCODING': 'gzip'})
+        response = JSONResponse({'data': ['x'] * 1000})
+        response['ETag'] = '"abc"'
+        response = compress_response(request, response)
+        self.assertEqual(response['ETag'], 'W/"abc"')
+
+    def test_opt_out(self):
+        with mock.patch.object(BookList, 'compress', False):
+            r = self.get('book_list', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(r.has_header('Content-Encoding'))
+        self.assertNotIn('Accept-Encoding', r.get('Vary', ''))
@@ -1,7 +1,15 @@
+import datetime
 import json
+import uuid
+from decimal import Decimal
+from unittest import mock, skipIf
 
 from django.test import TestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
 from resticus import encoders
+from resticus.http import JSONResponse, StreamingJSONResponse
+from resticus.settings import api_settings
 from resticus.iterators import iterlist, iterdict
 
 
@@ -27,6 +35,10 @@ class TestEncode(TestCase):
         encoded = ''.join(self.encoder.iterencode(iterlist([])))
         assert encoded == json.dumps([])
 
+    def test_encode_empty_iterlist(self):
+        encoded = self.encoder.encode({'data': iterlist([])})
+        assert encoded == json.dumps({'data': []})
+
     def test_encode_iterdict(self):
         generator = iterdict((str(x), x) for x in range(10))
         encoded = self.encoder.encode(generator)
@@ -36,3 +48,155 @@ class TestEncode(TestCase):
         generator = iterdict((str(x), x) for x in range(10))
         encoded = ''.join(self.encoder.iterencode(generator))
         assert encoded == json.dumps({str(x): x for x in range(10)})
+
+    def test_encode_raw_json(self):
+        author = encoders.RawJSON('{"id":1,"name":"Foo \\"Bar\\""}')
+        data = {'author': author, 'books': [author, 1], 'str': 'x'}
+        expected = {
+            'author': {'id': 1, 'name': 'Foo "Bar"'},
+            'books': [{'id': 1, 'name': 'Foo "Bar"'}, 1],
+            'str': 'x',
+        }
+        assert json.loads(self.encoder.encode(data)) == expected
+        assert json.loads(''.join(self.encoder.iterencode(data))) == expected
+        assert self.encoder.encode(encoders.RawJSON(b'[1]')) == '[1]'
+
+    def test_raw_json_is_verbatim(self):
+        encoded = self.encoder.encode([encoders.RawJSON(b'{ "a" : 1 }')])
+        assert encoded == '[{ "a" : 1 }]'
+
+    def test_forged_placeholders(self):
+        """Test that placeholders in the data aren't spliced"""
+        author = encoders.RawJSON(b'{"id":1}')
+        forged = ['\x00rawjson:0\x00', '\x00rawjson:0123456789abcdef:0\x00']
+        data = {'author': author, 'forged': forged}
+        expected = {'author': {'id': 1}, 'forged': forged}
+        assert json.loads(self.encoder.encode(data)) == expected
+        assert json.loads(''.join(self.encoder.iterencode(data))) == expected
+
+    def test_raw_json_is_spliced_once(self):
+        encoder = encoders.JSONEncoder()
+        placeholder = '\x00rawjson:%s:1\x00' % encoder.raw_json_nonce
+        data = [encoders.RawJSON(json.dumps(placeholder)),
+            encoders.RawJSON(b'2')]
+        assert json.loads(encoder.encode(data)) == [placeholder, 2]
+
+
+async def empty():
+    return
+    yield
+
+
+class TestStreamingResponse(TestCase):
+    def test_fragments_are_coalesced(self):
+        data = {'data': ({'id': x, 'name': 'item'} for x in range(1000))}
+        response = StreamingJSONResponse(data, buffer_size=4096)
+        chunks = list(response.streaming_content)
+        assert len(chunks) < 10
+        assert all(len(chunk) >= 4096 for chunk in chunks[:-1])
+        assert json.loads(b''.join(chunks)) == {
+            'data': [{'id': x, 'name': 'item'} for x in range(1000)]
+        }
+
+    def test_raw_json(self):
+        rows = (encoders.RawJSON('{"id":%d}' % x) for x in range(3))
+        response = StreamingJSONResponse({'data': rows})
+        assert json.loads(b''.join(response.streaming_content)) == {
+            'data': [{'id': 0}, {'id': 1}, {'id': 2}]
+        }
+
+    def test_unbuffered(self):
+        response = StreamingJSONResponse([1, 2], buffer_size=0)
+        assert len(list(response.streaming_content)) > 1
+
+    def test_async_iterator(self):
+        async def rows():
+            for x in range(3):
+                yield {'id': x}
+
+        response = StreamingJSONResponse({'data': rows(), 'empty': empty()})
+        assert json.loads(b''.join(response)) == {
+            'data': [{'id': 0}, {'id': 1}, {'id': 2}],
+            'empty': [],
+        }
+
+
+@skipIf(encoders.orjson is None, 'orjson is not installed')
+class TestORJSONEncode(TestCase):
+    def setUp(self):
+        self.encoder = encoders.ORJSONEncoder()
+        self.data = {
+            'datetime': timezone.now(),
+            'naive': datetime.datetime(2020, 1, 2, 3, 4, 5, 678901),
+            'date': datetime.date(2020, 1, 2),
+            'time': datetime.time(3, 4, 5, 678901),
+            'duration': datetime.timedelta(days=1, seconds=5),
+            'decimal': Decimal('10.50'),
+            'uuid': uuid.uuid4(),
+            'promise': gettext_lazy('Malformed request.'),
+            1: 'int key',
+            'huge': 2 ** 70,
+            'nested': [{'a': (1, 2)}, None, True, 1.5],
+        }
+
+    def assertParity(self, data, encoded):
+        expected = encoders.JSONEncoder().encode(data)
+        assert isinstance(encoded, bytes)
+        assert json.loads(encoded) == json.loads(expected)
+
+    def test_encode_bytes(self):
+        self.assertParity(self.data, self.encoder.encode_bytes(self.data))
+
+    def test_encode_lazy(self):
+        data = {
+            'list': iterlist(x for x in range(10)),
+            'dict': iterdict((str(x), x) for x in range(10)),
+            'generator': (x for x in range(10)),
+        }
+        encoded = self.encoder.encode_bytes(data)
+        assert json.loads(encoded) == {
+            'list': list(range(10)),
+            'dict': {str(x): x for x in range(10)},
+            'generator': list(range(10)),
+        }
+
+    def test_fallback_keeps_lazy_values(self):
+        """Test that lazy values consumed by orjson are encoded again"""
+        data = {
+            'data': (x for x in range(3)),
+            'nested': [{'rows': iterlist(x for x in range(2))}],
+            'dict': iterdict((str(x), x) for x in range(2)),
+            'huge': 2 ** 70,
+        }
+        assert json.loads(self.encoder.encode_bytes(data)) == {
+            'data': [0, 1, 2],
+            'nested': [{'rows': [0, 1]}],
+            'dict': {'0': 0, '1': 1},
+            'huge': 2 ** 70,
+        }
+
+    def test_iterencode(self):
+        data = dict(self.data, rows=({'id': x, 'when': self.data['date']}
+            for x in range(10)), empty=iterlist([]))
+        chunks = list(self.encoder.iterencode(data))
+        assert len(chunks) > 10
+        data['rows'] = [{'id': x, 'when': self.data['date']} for x in range(10)]
+        self.assertParity(data, b''.join(chunks))
+
+    def test_raw_json(self):
+        author = encoders.RawJSON(b'{"id":1}')
+        data = {'author': author, 'rows': (author for x in range(2)),
+            'huge': [author, 2 ** 70]}
+        assert json.loads(b''.join(self.encoder.iterencode(data))) == {
+            'author': {'id': 1},
+            'rows': [{'id': 1}, {'id': 1}],
+            'huge': [{'id': 1}, 2 ** 70],
+        }
+
+    @mock.patch.object(api_settings, 'JSON_ENCODER', encoders.ORJSONEncoder)
+    def test_responses(self):
+        response = JSONResponse({'data': self.data})
+        self.assertParity({'data': self.data}, response.content)
+
+        response = StreamingJSONResponse({'data': (x for x in range(3))})
+        assert b''.join(response.streaming_content) == b'{"data":[0,1,2]}'
@@ -1,8 +1,10 @@
 import base64
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
+from resticus.auth import BasicHttpAuth
 from resticus.compat import json
 from .client import TestClient, debug
 from .testapp.models import Publisher, Author, Book
+from .testapp.views import BasicAuthEndpoint
 
 try:
     from urllib.parse import urlencode
@@ -128,3 +130,44 @@ class TestEndpoint(TestCase):
     def test_raising_http_error_returns_it(self):
         r = self.client.get('error_raising_view')
         self.assertEqual(r.status_code, 400)
+
+
+class StatefulAuth(BasicHttpAuth):
+    stateful = True
+
+
+class TestDispatchPlan(SimpleTestCase):
+    def get_endpoint(self, view):
+        return view.view_class(**view.view_initkwargs)
+
+    def test_shares_stateless_instances(self):
+        """Test that stateless authenticators are instantiated once"""
+        view = BasicAuthEndpoint.as_view()
+        first, second = self.get_endpoint(view), self.get_endpoint(view)
+        self.assertIsInstance(first.get_authenticators()[0], BasicHttpAuth)
+        self.assertIs(first.get_authenticators()[0],
+            second.get_authenticators()[0])
+
+    def test_instantiates_stateful_classes(self):
+        """Test that stateful authenticators are created per request"""
+        view = BasicAuthEndpoint.as_view(authentication_classes=(StatefulAuth,))
+        endpoint = self.get_endpoint(view)
+        self.assertIsInstance(endpoint.get_authenticators()[0], StatefulAuth)
+        self.assertIsNot(endpoint.get_authenticators()[0],
+            endpoint.get_authenticators()[0])
+
+    def test_resolves_login_required(self):
+        """Test that the per-method login_required flags are resolved"""
+        plan = BasicAuthEndpoint.as_view(
+            login_required=False).view_initkwargs['dispatch_plan']
+        self.assertTrue(plan.login_required['get'])
+        self.assertTrue(plan.login_required['head'])
+        self.assertTrue(plan.login_required['post'])
+        self.assertFalse(plan.login_required['put'])
+
+    def test_without_as_view(self):
+        """Test that endpoints created directly get a plan too"""
+        endpoint = BasicAuthEndpoint()
+        self.assertIsInstance(endpoint.get_authenticators()[0], BasicHttpAuth)
+        self.assertIs(endpoint.get_permissions()[0],
+            endpoint.get_permissions()[0])
@@ -1,10 +1,25 @@
+import base64
+import datetime
 from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, connection
+from django.db.models import Prefetch, QuerySet
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
 from resticus.compat import json
+from resticus.pagination import CursorPaginator, InvalidCursor, Paginator
+from resticus.utils import filterset_factory
 
 from .client import TestClient, debug
-from .testapp.models import Publisher, Author, Book
+from .testapp.models import Article, Publisher, Author, Book, Tag
+from .testapp.views import (BookList, NestedBookList, PrefetchedAuthorList,
+    PublisherList)
 
 
 class TestModelViews(TestCase):
@@ -73,7 +88,524 @@ class TestModelViews(TestCase):
         self.assertEqual(r.status_code, 200)
         self.assertEqual(r.json['data']['id'], self.book.id)
 
+    def test_overridden_get_object(self):
+        """Test that get_object() overrides without arguments still work"""
+
+        r = self.client.get('custom_book_detail', isbn=self.book.isbn)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json['data']['id'], self.book.id)
+
     def test_author_create_invalid(self):
         """Test the form validation errors"""
         r = self.client.post('author_list', {})
         self.assertEqual(r.status_code, 400)
+
+    def test_form_classes_are_cached(self):
+        """Test that generated form classes are built once per model"""
+        form_class = PublisherList().get_form_class()
+        self.assertIs(PublisherList().get_form_class(), form_class)
+
+        r = self.client.post('publisher_list', {'name': 'User Bar'})
+        self.assertEqual(r.status_code, 201)
+        self.assertIs(PublisherList().get_form_class(), form_class)
+
+    def test_filtersets_are_cached(self):
+        filterset = filterset_factory(Book, fields=['title'])
+        self.assertIs(filterset_factory(Book, fields=['title']), filterset)
+        self.assertIsNot(filterset_factory(Book, fields=['isbn']), filterset)
+
+    def test_fast_values_list(self):
+        """Excercise the values() fast path in ListEndpoint"""
+
+        with mock.patch.object(Book, 'from_db') as from_db:
+            r = self.client.get('fast_book_list')
+        self.assertFalse(from_db.called)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json['data'], [{
+            'id': self.book.id,
+            'title': 'Book',
+            'author': self.author.id,
+            'price': '10.00',
+        }])
+
+    def _create_books(self, count):
+        tag = Tag.objects.create(name='Tag')
+        for i in range(count):
+            author = Author.objects.create(name='Author %d' % i)
+            book = author.books.create(title='Book %d' % i, isbn='isbn-%d' % i,
+                price=Decimal('10.0'), publisher=self.publisher)
+            book.tags.add(tag)
+
+    def _get_book_page(self, page, count_strategy):
+        with mock.patch.object(BookList, 'page_size', 4), \
+                mock.patch.object(BookList, 'count_strategy', count_strategy), \
+                CaptureQueriesContext(connection) as queries:
+            r = self.client.get('book_list', data={'page': page})
+        counts = [q for q in queries if 'COUNT(' in q['sql']]
+        return r, counts
+
+    def test_uncounted_pagination(self):
+        """Test that pages don't have to count the objects"""
+
+        self._create_books(10)
+        r, counts = self._get_book_page(1, 'none')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(counts, [])
+        self.assertEqual(len(r.json['data']), 4)
+        self.assertIsNone(r.json['count'])
+        self.assertIsNone(r.json['pages'])
+        self.assertTrue(r.json['has_next_page'])
+
+        r, counts = self._get_book_page(3, 'none')
+        self.assertEqual(len(r.json['data']), 3)
+        self.assertFalse(r.json['has_next_page'])
+        self.assertTrue(r.json['has_previous_page'])
+
+        r, counts = self._get_book_page(4, 'none')
+        self.assertEqual(r.status_code, 404)
+
+    def test_uncounted_pages_are_lazy(self):
+        """Test that uncounted pages stay QuerySets, to be streamed"""
+
+        self._create_books(5)
+        paginator = Paginator(Book.objects.order_by('pk'), 4,
+            count_strategy='none')
+        page = paginator.page(1)
+        self.assertIsInstance(page.object_list, QuerySet)
+        self.assertTrue(page.has_next())
+        self.assertEqual(len(page.object_list), 4)
+        self.assertFalse(paginator.page(2).has_next())
+
+    def test_cached_count(self):
+        """Test that counts are cached per query"""
+
+        self.addCleanup(cache.clear)
+        self._create_books(10)
+        r, counts = self._get_book_page(1, 'cached')
+        self.assertEqual(r.json['count'], 11)
+        self.assertEqual(len(counts), 1)
+
+        r, counts = self._get_book_page(2, 'cached')
+        self.assertEqual(r.json['count'], 11)
+        self.assertEqual(counts, [])
+        self.assertTrue(r.json['has_next_page'])
+
+    def test_estimated_count(self):
+        """Test that only large estimates stand in for the count"""
+
+        self._create_books(10)
+        with mock.patch.object(Paginator, 'estimate_count', return_value=50000):
+            r, counts = self._get_book_page(3, 'estimate')
+        self.assertEqual(counts, [])
+        self.assertEqual(r.json['count'], 50000)
+        self.assertFalse(r.json['has_next_page'])
+
+        with mock.patch.object(Paginator, 'estimate_count', return_value=20):
+            r, counts = self._get_book_page(3, 'estimate')
+        self.assertEqual(len(counts), 1)
+        self.assertEqual(r.json['count'], 11)
+        self.assertEqual(r.json['pages'], 3)
+
+    def _walk_cursor_pages(self, direction, cursor=None):
+        pages = []
+        while True:
+            r = self.client.get('cursor_book_list',
+                data={'cursor': cursor} if cursor else {})
+            self.assertEqual(r.status_code, 200)
+            pages.append([book['id'] for book in r.json['data']])
+            cursor = r.json[direction]
+            if cursor is None:
+                return pages, r.json
+
+    def test_cursor_pagination(self):
+        """Excercise walking through pages by cursor, both ways"""
+
+        self._create_books(10)
+        for index, book in enumerate(Book.objects.order_by('pk')):
+            book.price = Decimal(index % 3)
+            book.save()
+        expected = list(Book.objects.order_by('-price', 'pk').values_list(
+            'id', flat=True))
+
+        pages, last = self._walk_cursor_pages('next')
+        self.assertEqual([len(page) for page in pages], [4, 4, 3])
+        self.assertEqual(sum(pages, []), expected)
+        self.assertNotIn('count', last)
+
+        backwards, first = self._walk_cursor_pages('previous', last['previous'])
+        self.assertEqual(backwards, pages[-2::-1])
+        self.assertIsNone(first['previous'])
+        self.assertIsNotNone(first['next'])
+
+    def test_cursor_pagination_queries(self):
+        """Test that cursor pages don't count or offset"""
+
+        self._create_books(10)
+        r = self.client.get('cursor_book_list')
+        with CaptureQueriesContext(connection) as queries:
+            r = self.client.get('cursor_book_list', data={
+                'cursor': r.json['next']})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+
+    def test_invalid_cursor(self):
+        r = self.client.get('cursor_book_list', data={'cursor': 'garbage'})
+        self.assertEqual(r.status_code, 404)
+
+    def test_forged_cursors(self):
+        """Test that positions the fields can't filter by are invalid"""
+
+        paginator = CursorPaginator(Article.objects.all(), ('-updated', 'pk'), 2)
+        for position in [[['x'], '1'], [{'a': 1}, '1'],
+                ['2020-01-02T03:04:05', 2 ** 70], ['2020-01-02T03:04:05', [1]]]:
+            cursor = base64.urlsafe_b64encode(
+                json.dumps([False, position]).encode('utf-8')).decode('ascii')
+            with self.assertRaises(InvalidCursor):
+                list(paginator.page(cursor).object_list)
+
+    def test_cursor_datetimes_keep_microseconds(self):
+        """Test that cursors don't round datetimes to milliseconds"""
+
+        base = timezone.now().replace(microsecond=0)
+        for i in range(6):
+            article = Article.objects.create(title='Article %d' % i)
+            Article.objects.filter(pk=article.pk).update(
+                updated=base + datetime.timedelta(microseconds=i * 10))
+
+        for ordering in [('-updated', 'pk'), ('updated',)]:
+            paginator = CursorPaginator(Article.objects.all(), ordering, 2)
+            expected = list(Article.objects.order_by(*paginator.ordering))
+            page, pages = paginator.page(), []
+            while True:
+                pages.extend(page.object_list)
+                if not page.has_next():
+                    break
+                page = paginator.page(page.next_cursor)
+            self.assertEqual(pages, expected)
+
+    def test_cursor_ordering_by_lookups(self):
+        with self.assertRaises(ImproperlyConfigured):
+            CursorPaginator(Book.objects.all(), ('author__name',), 2)
+
+    def test_related_fields_are_optimized(self):
+        """Excercise select_related/prefetch_related derived from fields"""
+
+        self._create_books(10)
+        # count, page, tags
+        with self.assertNumQueries(3):
+            r = self.client.get('nested_book_list')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(r.json['data']), 11)
+        self.assertEqual(r.json['data'][1]['author'], {'name': 'Author 0'})
+        self.assertEqual(len(r.json['data'][1]['tags']), 1)
+
+    def test_nested_related_fields_are_optimized(self):
+        """Excercise Prefetch with nested select_related"""
+
+        self._create_books(10)
+        # count, page, books with publishers
+        with self.assertNumQueries(3):
+            r = self.client.get('nested_author_list')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json['data'][0]['books'], [
+            {'title': 'Book', 'publisher': {'name': 'User Foo'}},
+        ])
+
+    def test_existing_prefetches_are_kept(self):
+        """Test that relations get_queryset() prefetches aren't prefetched again"""
+
+        self._create_books(2)
+        with self.assertNumQueries(3):
+            r = self.client.get('prefetched_author_list')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json['data'][1]['books'], [{'title': 'Book 0'}])
+
+        books = Prefetch('books', queryset=Book.objects.filter(title='Book 1'))
+        with mock.patch.object(PrefetchedAuthorList, 'queryset',
+                Author.objects.prefetch_related(books)):
+            r = self.client.get('prefetched_author_list')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([author['books'] for author in r.json['data']],
+            [[], [], [{'title': 'Book 1'}]])
+
+    def test_related_optimization_opt_out(self):
+        """Excercise disabling the related field optimization"""
+
+        self._create_books(10)
+        with self.assertNumQueries(2 + 2 * 11):
+            r = self.client.get('unoptimized_book_list')
+        self.assertEqual(r.status_code, 200)
+
+    def test_unused_columns_are_deferred(self):
+        """Excercise only() derived from fields"""
+
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get('nested_book_list')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json['data'][0]['author'], {'name': 'User Foo'})
+        book_query = ctx.captured_queries[1]['sql']
+        self.assertIn('"testapp_book"."title"', book_query)
+        self.assertIn('"testapp_author"."name"', book_query)
+        self.assertNotIn('"testapp_book"."isbn"', book_query)
+        self.assertNotIn('"testapp_book"."price"', book_query)
+
+    def test_prefetched_columns_are_deferred(self):
+        """Excercise only() in prefetch querysets"""
+
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get('nested_author_list')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 3)
+        books_query = ctx.captured_queries[2]['sql']
+        self.assertIn('"testapp_book"."author_id"', books_query)
+        self.assertNotIn('"testapp_book"."isbn"', books_query)
+
+    def test_callable_fields_load_all_columns(self):
+        """Excercise only() fallback when callables read other attributes"""
+
+        with self.assertNumQueries(2):
+            r = self.client.get('callable_book_list')
+        self.assertEqual(r.json['data'][0]['label'], 'Book (1234)')
+
+    def test_lazy_streaming_query_errors(self):
+        """Test that failing queries of lazy lists are handled as errors"""
+
+        self._create_books(3)
+        with mock.patch('resticus.serializers.iterate_queryset',
+                side_effect=DatabaseError('Connection lost')):
+            r = self.client.get('book_list')
+        self.assertEqual(r.status_code, 500)
+
+    def test_overridden_serialize_loads_all_columns(self):
+        """Excercise only() fallback when serialize() is overridden"""
+
+        with self.assertNumQueries(3):
+            r = self.client.get('fixup_book_list')
+        self.assertEqual(r.json['data'][0]['isbn'], '1234')
+
+    def test_columns_are_not_deferred_by_default(self):
+        with mock.patch.object(NestedBookList, 'optimize_columns', False):
+            with CaptureQueriesContext(connection) as ctx:
+                r = self.client.get('nested_book_list')
+        self.assertEqual(r.status_code, 200)
+        self.assertIn('"testapp_book"."isbn"', ctx.captured_queries[1]['sql'])
+
+
+class TestBulkViews(TestCase):
+    def setUp(self):
+        self.client = TestClient()
+        self.publisher = Publisher.objects.create(name='User Foo')
+        self.author = Author.objects.create(name='User Foo')
+
+    def _book(self, i, **kwargs):
+        data = {'title': 'Book %d' % i, 'isbn': 'isbn-%d' % i, 'price': '10.00',
+            'author': self.author.id, 'publisher': self.publisher.id}
+        data.update(kwargs)
+        return data
+
+    def _send(self, method, url_name, data):
+        return getattr(self.client, method)(url_name, data=json.dumps(data),
+            content_type='application/json')
+
+    def test_bulk_create(self):
+        """Excercise creating objects in bulk"""
+
+        books = [self._book(i) for i in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            r = self._send('post', 'bulk_book_create', books)
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual([book['title'] for book in r.json['data']],
+            ['Book %d' % i for i in range(5)])
+        self.assertEqual(Book.objects.count(), 5)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+
+    def test_bulk_create_invalid(self):
+        """Test that invalid items are reported by index, and nothing is saved"""
+
+        books = [self._book(0), self._book(1, price='free'), self._book(2),
+            self._book(3, title='')]
+        r = self._send('post', 'bulk_book_create', books)
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(set(r.json['errors']), {'1', '3'})
+        self.assertIn('price', r.json['errors']['1'])
+        self.assertIn('title', r.json['errors']['3'])
+        self.assertFalse(Book.objects.exists())
+
+    def test_bulk_create_expects_a_list(self):
+        r = self._send('post', 'bulk_book_create', self._book(0))
+        self.assertEqual(r.status_code, 400)
+
+    def test_bulk_update(self):
+        """Excercise updating objects in bulk"""
+
+        self._send('post', 'bulk_book_create', [self._book(i) for i in range(3)])
+        with CaptureQueriesContext(connection) as queries:
+            r = self._send('put', 'bulk_book_update', [
+                self._book(0, title='Changed 0'),
+                self._book(2, title='Changed 2', price='20.00'),
+            ])
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(
+            dict(Book.objects.values_list('isbn', 'title')),
+            {'isbn-0': 'Changed 0', 'isbn-1': 'Book 1', 'isbn-2': 'Changed 2'})
+        self.assertEqual(Book.objects.get(isbn='isbn-2').price, Decimal('20.00'))
+        updates = [q for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+    def test_bulk_patch(self):
+        """Test that PATCH only requires and writes the given fields"""
+
+        self._send('post', 'bulk_book_create', [self._book(i) for i in range(2)])
+        r = self.client.process(self.client.patch(
+            reverse('bulk_book_update'),
+            data=json.dumps([{'isbn': 'isbn-1', 'price': '5.00'}]),
+            content_type='application/json'))
+        self.assertEqual(r.status_code, 200)
+        book = Book.objects.get(isbn='isbn-1')
+        self.assertEqual(book.price, Decimal('5.00'))
+        self.assertEqual(book.title, 'Book 1')
+
+    def test_bulk_update_missing(self):
+        """Test that items which don't match any object are reported"""
+
+        self._send('post', 'bulk_book_create', [self._book(0)])
+        r = self._send('put', 'bulk_book_update', [
+            self._book(0, title='Changed'), self._book(1)])
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(list(r.json['errors']), ['1'])
+        self.assertEqual(Book.objects.get().title, 'Book 0')
+
+    def test_bulk_create_m2m(self):
+        """Test that many-to-many data is saved for created objects"""
+
+        tags = [Tag.objects.create(name='Tag %d' % i) for i in range(2)]
+        r = self._send('post', 'bulk_book_create', [self._book(0),
+            self._book(1, tags=[tag.id for tag in tags]), self._book(2)])
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(
+            {book.isbn: set(book.tags.all()) for book in Book.objects.all()},
+            {'isbn-0': set(), 'isbn-1': set(tags), 'isbn-2': set()})
+
+    def test_bulk_update_invalid_lookups(self):
+        """Test that lookup values of the wrong type are reported by index"""
+
+        self._send('post', 'bulk_book_create', [self._book(0)])
+        r = self._send('put', 'bulk_book_update', [self._book(0),
+            self._book(1, isbn=['isbn-1']), self._book(2, isbn={'a': 1})])
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(set(r.json['errors']), {'1', '2'})
+        self.assertEqual(r.json['errors']['1']['isbn'][0]['code'], 'invalid')
+
+        article = Article.objects.create(title='Article')
+        r = self.client.process(self.client.patch(
+            reverse('bulk_article_update'), content_type='application/json',
+            data=json.dumps([{'id': 'abc'}, {'id': str(article.pk)}])))
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(list(r.json['errors']), ['0'])
+
+    def test_bulk_delete_invalid_lookups(self):
+        """Test that lookup values of the wrong type are reported by index"""
+
+        article = Article.objects.create(title='Article')
+        r = self._send('delete', 'bulk_article_delete',
+            [article.pk, 'abc', {'a': 1}, [1]])
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(set(r.json['errors']), {'1', '2', '3'})
+        self.assertTrue(Article.objects.exists())
+
+    def test_bulk_update_auto_now(self):
+        """Test that auto_now fields are set for updated objects"""
+
+        article = Article.objects.create(title='Article')
+        updated = timezone.now() - datetime.timedelta(days=1)
+        Article.objects.update(updated=updated)
+        r = self._send('put', 'bulk_article_update',
+            [{'id': article.pk, 'title': 'Changed'}])
+        self.assertEqual(r.status_code, 200)
+        article.refresh_from_db()
+        self.assertEqual(article.title, 'Changed')
+        self.assertGreater(article.updated, updated)
+
+    def test_bulk_delete(self):
+        """Excercise deleting objects, with as many queries for any number"""
+
+        self._send('post', 'bulk_book_create', [self._book(i) for i in range(4)])
+        with CaptureQueriesContext(connection) as one:
+            r = self._send('delete', 'bulk_book_delete', ['isbn-0'])
+        self.assertEqual(r.status_code, 204)
+        with CaptureQueriesContext(connection) as many:
+            r = self._send('delete', 'bulk_book_delete',
+                ['isbn-1', 'isbn-3', 'isbn-4'])
+        self.assertEqual(r.status_code, 204)
+        self.assertEqual(list(Book.objects.values_list('isbn', flat=True)),
+            ['isbn-2'])
+        self.assertEqual(len(one), len(many))
+
+
+class TestConditionalViews(TestCase):
+    def setUp(self):
+        self.article = Article.objects.create(title='Article')
+
+    def _get(self, url_name, extra={}, data={}, **kwargs):
+        # 304 responses don't have a body (nor a Content-Type) to decode.
+        return self.client.get(reverse(url_name, kwargs=kwargs), data, **extra)
+
+    def test_detail_validators(self):
+        """Test that details are only sent if they changed"""
+
+        r = self._get('article_detail', pk=self.article.pk)
+        self.assertEqual(r.status_code, 200)
+        etag = r['ETag']
+        self.assertIn('Last-Modified', r)
+
+        with mock.patch('resticus.generics.GenericEndpoint.serialize') as serialize:
+            r = self._get('article_detail', {'HTTP_IF_NONE_MATCH': etag},
+                pk=self.article.pk)
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r['ETag'], etag)
+        self.assertFalse(serialize.called)
+
+        self.article.version += 1
+        self.article.save()
+        r = self._get('article_detail', {'HTTP_IF_NONE_MATCH': etag},
+            pk=self.article.pk)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r['ETag'], etag)
+
+    def test_detail_if_modified_since(self):
+        r = self._get('article_detail', pk=self.article.pk)
+        r = self._get('article_detail',
+            {'HTTP_IF_MODIFIED_SINCE': r['Last-Modified']}, pk=self.article.pk)
+        self.assertEqual(r.status_code, 304)
+
+    def test_list_validators(self):
+        """Test that lists are only sent if they changed"""
+
+        r = self._get('article_list')
+        self.assertEqual(r.status_code, 200)
+        etag = r['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            r = self._get('article_list', {'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(len(queries), 1)
+
+        r = self._get('article_list', {'HTTP_IF_NONE_MATCH': etag},
+            data={'page': 1})
+        self.assertEqual(r.status_code, 200)
+
+        self.article.delete()
+        r = self._get('article_list', {'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(b''.join(r.streaming_content))['data'], [])
+
+    def test_list_etag_membership(self):
+        """Test that list ETags change when objects replace others"""
+
+        Article.objects.create(title='Another')
+        etag = self._get('versioned_article_list')['ETag']
+        self.article.delete()
+        Article.objects.create(title='Replacement')
+        r = self._get('versioned_article_list', {'HTTP_IF_NONE_MATCH': etag})
+        self.assertEqual(r.status_code, 200)
@@ -0,0 +1,272 @@
+import csv
+import datetime
+import io
+import unittest
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from resticus.compat import json
+from resticus.http import StreamingRenderedResponse
+from resticus.renderers import (ArrowRenderer, CBORRenderer, CSVRenderer,
+    JSONRenderer, MessagePackRenderer, NDJSONRenderer, negotiate_renderer)
+from resticus.settings import api_settings
+from .testapp.models import Article, Author, Publisher
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class TestNegotiation(TestCase):
+    def negotiate(self, accept):
+        return negotiate_renderer(accept, api_settings.RENDERERS)
+
+    def test_exact_match(self):
+        self.assertIs(self.negotiate('application/json'), JSONRenderer)
+
+    @unittest.skipUnless(msgpack and cbor2, 'msgpack and cbor2 are required')
+    def test_quality(self):
+        """Test that the best quality wins, then the order in the header"""
+        self.assertIs(self.negotiate(
+            'application/json;q=0.5, application/cbor'), CBORRenderer)
+        self.assertIs(self.negotiate(
+            'application/msgpack, application/cbor'), MessagePackRenderer)
+
+    def test_fallback(self):
+        """Test that JSON is rendered for missing or unmatched headers"""
+        self.assertIs(self.negotiate(None), JSONRenderer)
+        self.assertIs(self.negotiate('text/html'), JSONRenderer)
+        self.assertIs(self.negotiate('*/*'), JSONRenderer)
+        self.assertIs(self.negotiate('application/*'), JSONRenderer)
+
+
+class TestRenderedResponses(TestCase):
+    def setUp(self):
+        self.publisher = Publisher.objects.create(name='Publisher')
+        author = Author.objects.create(name='Author')
+        for i in range(5):
+            author.books.create(title='Book %d' % i, isbn='isbn-%d' % i,
+                price=Decimal('10.50'), publisher=self.publisher)
+
+    def get(self, url_name, accept, *args):
+        r = self.client.get(reverse(url_name, args=args), HTTP_ACCEPT=accept)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r['Content-Type'], accept)
+        self.assertIn('Accept', r['Vary'])
+        return r
+
+    def json(self, url_name, *args):
+        r = self.client.get(reverse(url_name, args=args))
+        if r.streaming:
+            return json.loads(b''.join(r.streaming_content))
+        return json.loads(r.content)
+
+    @unittest.skipUnless(msgpack, 'msgpack is required')
+    def test_streamed_msgpack(self):
+        """Test that streamed lists decode to the same data as JSON"""
+        r = self.get('book_list', 'application/msgpack')
+        data = msgpack.unpackb(b''.join(r.streaming_content), raw=False)
+        self.assertEqual(data, self.json('book_list'))
+        self.assertEqual(data['data'][0]['price'], '10.50')
+
+    @unittest.skipUnless(cbor2, 'cbor2 is required')
+    def test_streamed_cbor(self):
+        r = self.get('book_list', 'application/cbor')
+        data = cbor2.loads(b''.join(r.streaming_content))
+        self.assertEqual(data, self.json('book_list'))
+
+    @unittest.skipUnless(msgpack, 'msgpack is required')
+    def test_msgpack(self):
+        r = self.get('publisher_detail', 'application/msgpack', self.publisher.pk)
+        self.assertEqual(msgpack.unpackb(r.content, raw=False),
+            self.json('publisher_detail', self.publisher.pk))
+
+    @unittest.skipUnless(cbor2, 'cbor2 is required')
+    def test_cbor_lazy_values(self):
+        """Test that lazy lists are rendered as indefinite-length arrays"""
+        when = datetime.datetime(2020, 1, 2, 3, 4, 5)
+        response = StreamingRenderedResponse({
+            'data': (i for i in range(3)),
+            'when': when,
+        }, CBORRenderer())
+        content = b''.join(response.streaming_content)
+        self.assertIn(b'\x9f', content)
+        self.assertEqual(cbor2.loads(content),
+            {'data': [0, 1, 2], 'when': json.loads(json.dumps(
+                when, cls=api_settings.JSON_ENCODER))})
+
+    @unittest.skipUnless(msgpack, 'msgpack is required')
+    def test_msgpack_request_body(self):
+        r = self.client.post(reverse('publisher_list'),
+            data=msgpack.packb({'name': 'Another Publisher'}),
+            content_type='application/msgpack')
+        self.assertEqual(r.status_code, 201)
+        self.assertTrue(Publisher.objects.filter(name='Another Publisher').exists())
+
+    @unittest.skipUnless(msgpack, 'msgpack is required')
+    def test_invalid_request_body(self):
+        r = self.client.post(reverse('publisher_list'), data=b'\xc1',
+            content_type='application/msgpack')
+        self.assertEqual(r.status_code, 400)
+
+
+class TestNDJSON(TestCase):
+    def setUp(self):
+        publisher = Publisher.objects.create(name='Publisher')
+        author = Author.objects.create(name='Author')
+        for i in range(5):
+            author.books.create(title='Book %d' % i, isbn='isbn-%d' % i,
+                price=Decimal('10.50'), publisher=publisher)
+
+    def get_lines(self, url_name, params=None, **extra):
+        r = self.client.get(reverse(url_name), params, **extra)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r['Content-Type'], 'application/x-ndjson')
+        content = b''.join(r.streaming_content) if r.streaming else r.content
+        self.assertTrue(content.endswith(b'\n'))
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_accept_header(self):
+        """Test that each row is rendered on its own line, then metadata"""
+        lines = self.get_lines('book_list', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual([line['title'] for line in lines[:-1]],
+            ['Book %d' % i for i in range(5)])
+        self.assertEqual(lines[-1]['meta']['count'], 5)
+
+    def test_query_param(self):
+        lines = self.get_lines('book_list', {'format': 'ndjson'},
+            HTTP_ACCEPT='application/json')
+        self.assertEqual(len(lines), 6)
+
+    def test_rows_are_streamed(self):
+        """Test that rows are written out one at a time"""
+        with mock.patch.object(api_settings, 'STREAMING_BUFFER_SIZE', 0):
+            r = self.client.get(reverse('book_list'), {'format': 'ndjson'})
+            chunks = list(r.streaming_content)
+        self.assertEqual(len(chunks), 6)
+        self.assertTrue(all(chunk.count(b'\n') == 1 for chunk in chunks))
+
+    def test_without_metadata(self):
+        with mock.patch.object(NDJSONRenderer, 'metadata_key', None):
+            lines = self.get_lines('book_list', {'format': 'ndjson'})
+        self.assertEqual(len(lines), 5)
+
+    def test_single_object(self):
+        renderer = NDJSONRenderer()
+        self.assertEqual(renderer.render({'data': {'id': 1}}), b'{"id": 1}\n')
+
+
+class TestTabular(TestCase):
+    def setUp(self):
+        publisher = Publisher.objects.create(name='Publisher')
+        author = Author.objects.create(name='Author')
+        for i in range(5):
+            author.books.create(title='Book %d' % i, isbn='isbn-%d' % i,
+                price=Decimal('10.50'), publisher=publisher)
+
+    def get_content(self, format, **params):
+        params['format'] = format
+        r = self.client.get(reverse('book_list'), params)
+        self.assertEqual(r.status_code, 200)
+        return b''.join(r.streaming_content)
+
+    def test_csv(self):
+        """Test that columns follow the field spec, with a header row"""
+        content = self.get_content('csv').decode('utf-8')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0],
+            ['id', 'author', 'publisher', 'title', 'isbn', 'price'])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][3:], ['Book 0', 'isbn-0', '10.50'])
+
+    def test_csv_flattening(self):
+        """Test that nested objects are flattened, and lists are JSON"""
+        content = CSVRenderer().render({'data': [
+            {'id': 1, 'author': {'name': 'Author'}, 'tags': [1, 2],
+                'created': datetime.date(2020, 1, 2)},
+        ]})
+        self.assertEqual(content.decode('utf-8').splitlines(), [
+            'id,author.name,tags,created',
+            '1,Author,"[1, 2]",2020-01-02',
+        ])
+
+    def test_rows_are_batched(self):
+        """Test that rows are written out a batch at a time"""
+        with mock.patch.object(CSVRenderer, 'batch_size', 2), \
+                mock.patch.object(api_settings, 'STREAMING_BUFFER_SIZE', 0):
+            r = self.client.get(reverse('book_list'), {'format': 'csv'})
+            chunks = [chunk for chunk in r.streaming_content if chunk]
+        self.assertEqual([chunk.count(b'\n') for chunk in chunks], [3, 2, 1])
+
+    def test_empty_csv(self):
+        self.assertEqual(CSVRenderer().render({'data': []}), b'')
+
+    @unittest.skipUnless(pyarrow, 'pyarrow is required')
+    def test_arrow(self):
+        """Test that metadata is in the schema of Arrow streams"""
+        table = pyarrow.ipc.open_stream(self.get_content('arrow')).read_all()
+        self.assertEqual(table.column_names,
+            ['id', 'author', 'publisher', 'title', 'isbn', 'price'])
+        self.assertEqual(table.column('title').to_pylist(),
+            ['Book %d' % i for i in range(5)])
+        self.assertEqual(json.loads(table.schema.metadata[b'meta'])['count'], 5)
+
+    @unittest.skipUnless(pyarrow, 'pyarrow is required')
+    def test_parquet(self):
+        with mock.patch.object(api_settings, 'STREAMING_CHUNK_SIZE', 2):
+            content = self.get_content('parquet')
+        parquet = pyarrow.parquet.ParquetFile(io.BytesIO(content))
+        self.assertEqual(parquet.metadata.num_row_groups, 3)
+        self.assertEqual(parquet.read().column('isbn').to_pylist(),
+            ['isbn-%d' % i for i in range(5)])
+
+    @unittest.skipUnless(pyarrow, 'pyarrow is required')
+    def test_arrow_untyped_columns(self):
+        """Test that columns without values in the first batch are strings"""
+        with mock.patch.object(ArrowRenderer, 'batch_size', 1):
+            content = ArrowRenderer().render({'data': iter([
+                {'id': 1, 'note': None}, {'id': 2, 'note': 3}])})
+        table = pyarrow.ipc.open_stream(content).read_all()
+        self.assertEqual(table.column('note').to_pylist(), [None, '3'])
+
+    @unittest.skipUnless(pyarrow, 'pyarrow is required')
+    def test_arrow_types_of_all_rows(self):
+        """Test that rows in memory are all used to type the columns"""
+        with mock.patch.object(ArrowRenderer, 'batch_size', 1):
+            content = ArrowRenderer().render({'data': [
+                {'price': 1, 'note': 'a'}, {'price': 1.5, 'note': 2}]})
+        table = pyarrow.ipc.open_stream(content).read_all()
+        self.assertEqual(table.column('price').to_pylist(), [1.0, 1.5])
+        self.assertEqual(table.column('note').to_pylist(), ['a', '2'])
+
+    def test_csv_nested_columns(self):
+        """Test that columns come from the field spec, not the first row"""
+        Article.objects.create(title='-1.5')
+        Article.objects.create(title='-Title',
+            author=Author.objects.create(name='=HYPERLINK("x")'))
+        r = self.client.get(reverse('nested_article_list'), {'format': 'csv'})
+        content = b''.join(r.streaming_content) if r.streaming else r.content
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8'))))
+        self.assertEqual(rows, [
+            ['id', 'title', 'author.name'],
+            [rows[1][0], '-1.5', ''],
+            [rows[2][0], "'-Title", '\'=HYPERLINK("x")'],
+        ])
+
+    def test_csv_formulas(self):
+        with mock.patch.object(CSVRenderer, 'escape_formulas', False):
+            content = CSVRenderer().render({'data': [{'a': '=1+1'}]})
+        self.assertEqual(content.decode('utf-8').splitlines()[1], '=1+1')
@@ -1,7 +1,12 @@
+import json
+import types
 import warnings
 from decimal import Decimal
+from unittest import mock
+from django.contrib.gis.geos import GEOSGeometry
 from django.test import TestCase
-from resticus.serializers import serialize, flatten
+from resticus.serializers import (Serializer, SerializationPlan, _plan_cache,
+    compile_plan, serialize, flatten, geometry_to_geojson)
 from .testapp.models import Publisher, Author, Book
 
 
@@ -185,3 +190,109 @@ class TestSerialization(TestCase):
             filter=lambda book: int(book.isbn.split('-')[-1]) < 5
         )
         assert len(s) == 5
+
+    def test_plan_is_cached(self):
+        """Test that the same spec compiles to the same plan"""
+
+        plan = compile_plan(Book, fields=['id', 'title'],
+            include=[('author', dict(fields=['name']))])
+        self.assertIs(plan, compile_plan(Book, fields=['id', 'title'],
+            include=[('author', dict(fields=['name']))]))
+        self.assertIsNot(plan, compile_plan(Book, fields=['id']))
+
+    def test_plan_compiled_once_per_queryset(self):
+        """Test that field lookups don't happen per instance, or per call"""
+
+        cached_plans = dict(_plan_cache)
+        self.addCleanup(_plan_cache.update, cached_plans)
+        self.addCleanup(_plan_cache.clear)
+        _plan_cache.clear()
+
+        fields = ('id', 'title', 'author')
+        compile_field = SerializationPlan.compile_field
+        with mock.patch.object(SerializationPlan, 'compile_field',
+                autospec=True, side_effect=compile_field) as counting:
+            s = serialize(Book.objects.all(), fields=fields)
+            self.assertEqual(len(s), len(self.books))
+            s = serialize(Book.objects.all(), fields=fields)
+            self.assertEqual(len(s), len(self.books))
+        self.assertEqual(counting.call_count, len(fields))
+        self.assertEqual(s[0]['author'], self.author.id)
+
+    def test_unhashable_spec(self):
+        """Test that specs that can't be cached are still serialized"""
+
+        s = serialize(self.books[0], fields=['title'], exclude={'isbn'})
+        self.assertEqual(s, {'title': 'Book 0'})
+
+    def test_values(self):
+        """Test that flat field specs serialize from QuerySet.values()"""
+
+        qs = Book.objects.order_by('id')
+        s = Serializer(qs, fields=['id', 'author']).values()
+        self.assertEqual(s, [
+            {'id': b.id, 'author': self.author.id} for b in self.books
+        ])
+
+        self.assertIsNone(Serializer(qs, fields=['id', ('x', str)]).values())
+        self.assertIsNone(Serializer(qs, fixup=flatten('author')).values())
+        self.assertIsNone(Serializer(self.books, fields=['id']).values())
+
+    def test_chunked_queryset_is_lazy(self):
+        """Test that a chunk_size makes QuerySet serialization lazy"""
+
+        with self.assertNumQueries(0):
+            s = serialize(Book.objects.order_by('id'), fields=['title'],
+                chunk_size=4)
+        self.assertTrue(isinstance(s, types.GeneratorType))
+        self.assertEqual([b['title'] for b in s],
+            [b.title for b in self.books])
+
+    def test_chunked_queryset_prefetches_per_chunk(self):
+        """Test that prefetch lookups still apply when iterating in chunks"""
+
+        qs = Author.objects.prefetch_related('books')
+        for i in range(9):
+            Author.objects.create(name='Author %d' % i)
+        # authors, then books for each of the 3 chunks
+        with self.assertNumQueries(4):
+            s = list(serialize(qs, include=['books'], chunk_size=4))
+        self.assertEqual(len(s), 10)
+        self.assertEqual(len(s[0]['books']), len(self.books))
+
+
+class TestGeometrySerialization(TestCase):
+    geometries = [
+        'POINT (1.5 2)',
+        'POINT Z (1 2 3)',
+        'LINESTRING (0 0, 1 1, 2 0)',
+        'LINEARRING (0 0, 1 1, 1 0, 0 0)',
+        'POLYGON ((0 0, 0 4, 4 4, 4 0, 0 0), (1 1, 1 2, 2 2, 2 1, 1 1))',
+        'MULTIPOINT ((0 0), (1 1))',
+        'MULTILINESTRING ((0 0, 1 1), (2 2, 3 3))',
+        'MULTIPOLYGON (((0 0, 0 1, 1 1, 0 0)), ((2 2, 2 3, 3 3, 2 2)))',
+        'GEOMETRYCOLLECTION (POINT (1 2), LINESTRING (0 0, 1 1))',
+    ]
+
+    def test_matches_gdal_geojson(self):
+        """Test that geometries convert like GEOSGeometry.geojson"""
+
+        for wkt in self.geometries:
+            geometry = GEOSGeometry(wkt)
+            converted = json.loads(json.dumps(geometry_to_geojson(geometry)))
+            self.assertEqual(converted, json.loads(geometry.geojson), wkt)
+
+    def test_empty(self):
+        """Test that empty geometries have no coordinates"""
+
+        self.assertEqual(geometry_to_geojson(GEOSGeometry('POINT EMPTY')),
+            {'type': 'Point', 'coordinates': ()})
+
+    def test_precision(self):
+        """Test that coordinates are rounded to the given precision"""
+
+        geometry = GEOSGeometry('LINESTRING (0.123456 1.987654, 2 3)')
+        self.assertEqual(geometry_to_geojson(geometry, precision=2), {
+            'type': 'LineString',
+            'coordinates': ((0.12, 1.99), (2, 3)),
+        })
@@ -2,10 +2,16 @@ from django import forms
 
 from .models import *
 
-__all__ = ['AuthorForm']
+__all__ = ['AuthorForm', 'BookForm']
 
 
 class AuthorForm(forms.ModelForm):
     class Meta:
         model = Author
         fields = ('name',)
+
+
+class BookForm(forms.ModelForm):
+    class Meta:
+        model = Book
+        fields = ('title', 'isbn', 'price', 'author', 'publisher', 'tags')
@@ -1,6 +1,6 @@
 from django.db import models
 
-__all__ = ['Author', 'Book', 'Publisher']
+__all__ = ['Article', 'Author', 'Book', 'Publisher', 'Tag']
 
 
 class Publisher(models.Model):
@@ -11,9 +11,22 @@ class Author(models.Model):
     name = models.CharField(max_length=255)
 
 
+class Tag(models.Model):
+    name = models.CharField(max_length=255)
+
+
 class Book(models.Model):
     author = models.ForeignKey(Author, related_name='books', on_delete=models.CASCADE)
     publisher = models.ForeignKey(Publisher, related_name='publisher', on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     isbn = models.CharField(max_length=64, unique=True)
     price = models.DecimalField(max_digits=20, decimal_places=2)
+    tags = models.ManyToManyField(Tag, related_name='books', blank=True)
+
+
+class Article(models.Model):
+    title = models.CharField(max_length=255)
+    version = models.PositiveIntegerField(default=1)
+    updated = models.DateTimeField(auto_now=True)
+    author = models.ForeignKey(Author, related_name='articles', null=True,
+        blank=True, on_delete=models.SET_NULL)
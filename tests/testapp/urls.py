@@ -24,8 +24,40 @@ urlpatterns = [
         name='publisher_detail'),
 
     path('books/', BookList.as_view(), name='book_list'),
+    path('books/fast/', FastBookList.as_view(), name='fast_book_list'),
+    path('books/nested/', NestedBookList.as_view(), name='nested_book_list'),
+    path('books/unoptimized/', UnoptimizedBookList.as_view(),
+        name='unoptimized_book_list'),
+    path('books/callable/', CallableBookList.as_view(),
+        name='callable_book_list'),
+    path('books/fixup/', FixupBookList.as_view(), name='fixup_book_list'),
+    path('authors/prefetched/', PrefetchedAuthorList.as_view(),
+        name='prefetched_author_list'),
+    path('authors/nested/', NestedAuthorList.as_view(),
+        name='nested_author_list'),
+    path('books/cursor/', CursorBookList.as_view(),
+        name='cursor_book_list'),
+    path('articles/', ArticleList.as_view(), name='article_list'),
+    path('articles/nested/', NestedArticleList.as_view(),
+        name='nested_article_list'),
+    path('articles/versioned/', VersionedArticleList.as_view(),
+        name='versioned_article_list'),
+    path('articles/<int:pk>', ArticleDetail.as_view(), name='article_detail'),
+    path('books/cached/', CachedBookList.as_view(), name='cached_book_list'),
+    path('books/bulk/create/', BulkBookCreate.as_view(),
+        name='bulk_book_create'),
+    path('books/bulk/update/', BulkBookUpdate.as_view(),
+        name='bulk_book_update'),
+    path('articles/bulk/update/', BulkArticleUpdate.as_view(),
+        name='bulk_article_update'),
+    path('articles/bulk/delete/', BulkArticleDelete.as_view(),
+        name='bulk_article_delete'),
+    path('books/bulk/delete/', BulkBookDelete.as_view(),
+        name='bulk_book_delete'),
     path('books/<int:isbn>', BookDetail.as_view(),
         name='book_detail'),
+    path('books/custom/<int:isbn>', CustomBookDetail.as_view(),
+        name='custom_book_detail'),
 
     path('fail-view/', FailsIntentionally.as_view(),
         name='fail_view'),
@@ -33,5 +65,13 @@ urlpatterns = [
         name='echo_view'),
     path('error-raising-view/', ErrorRaisingView.as_view(),
         name='error_raising_view'),
+    path('async/authors/', AsyncAuthorList.as_view(),
+        name='async_author_list'),
+    path('async/authors/<int:author_id>', AsyncAuthorDetail.as_view(),
+        name='async_author_detail'),
+    path('async/auth/basic/', AsyncBasicAuthEndpoint.as_view(),
+        name='async_basic_auth'),
+    path('async/stream/', AsyncStreamView.as_view(),
+        name='async_stream'),
     path('.*', WildcardHandler.as_view()),
 ]
@@ -1,19 +1,28 @@
 import base64
 
+from django.http import HttpResponse
 from resticus import generics
 from resticus.auth import login_required, BasicHttpAuth
 from resticus.exceptions import HttpError
 from resticus.http import Http201, Http403, Http404, Http400
 from resticus.serializers import serialize
-from resticus.views import Endpoint
+from resticus.views import AsyncEndpoint, Endpoint
 
 from .models import *
 from .filters import *
 from .forms import *
 
 __all__ = ['AuthorList', 'AuthorDetail', 'PublisherList', 'PublisherDetail',
-    'ReadOnlyPublisherList', 'BookList', 'BookDetail', 'FailsIntentionally',
-    'WildcardHandler', 'EchoView', 'ErrorRaisingView', 'BasicAuthEndpoint']
+    'ReadOnlyPublisherList', 'BookList', 'FastBookList', 'NestedBookList',
+    'NestedAuthorList', 'PrefetchedAuthorList', 'UnoptimizedBookList',
+    'CursorBookList', 'CallableBookList', 'FixupBookList', 'BookDetail',
+    'CustomBookDetail', 'BulkBookCreate', 'BulkBookUpdate', 'BulkArticleUpdate',
+    'BulkArticleDelete', 'BulkBookDelete', 'CachedBookList', 'ArticleList',
+    'NestedArticleList', 'VersionedArticleList', 'ArticleDetail',
+    'FailsIntentionally',
+    'WildcardHandler', 'EchoView', 'ErrorRaisingView', 'BasicAuthEndpoint',
+    'AsyncAuthorList', 'AsyncAuthorDetail', 'AsyncBasicAuthEndpoint',
+    'AsyncStreamView']
 
 
 class AuthorList(generics.ListCreateEndpoint):
@@ -43,6 +52,57 @@ class BookList(generics.ListEndpoint):
     model = Book
     filter_class = BookFilter
     streaming = True
+    lazy_streaming = True
+
+
+class FastBookList(generics.ListEndpoint):
+    model = Book
+    fields = ('id', 'title', 'author', 'price')
+    fast_values = True
+
+
+class NestedBookList(generics.ListEndpoint):
+    model = Book
+    fields = ('id', 'title', 'tags', ('author', dict(fields=['name'])))
+    optimize_columns = True
+
+
+class FixupBookList(NestedBookList):
+    def serialize(self, source, **kwargs):
+        return super().serialize(source,
+            fixup=lambda book, data: dict(data, isbn=book.isbn))
+
+
+class PrefetchedAuthorList(generics.ListEndpoint):
+    model = Author
+    fields = ('id', ('books', dict(fields=['title'])))
+    queryset = Author.objects.prefetch_related('books')
+
+
+class UnoptimizedBookList(NestedBookList):
+    optimize_related = False
+
+
+class CallableBookList(generics.ListEndpoint):
+    model = Book
+    fields = ('id', ('label', lambda book: '%s (%s)' % (book.title, book.isbn)))
+    optimize_columns = True
+
+
+class NestedAuthorList(generics.ListEndpoint):
+    model = Author
+    fields = ('id', ('books', dict(
+        fields=['title'],
+        include=[('publisher', dict(fields=['name']))],
+    )))
+    optimize_columns = True
+
+
+class CursorBookList(generics.ListEndpoint):
+    model = Book
+    fields = ('id', 'title', 'price')
+    cursor_ordering = ('-price',)
+    page_size = 4
 
 
 class BookDetail(generics.DetailEndpoint):
@@ -50,6 +110,69 @@ class BookDetail(generics.DetailEndpoint):
     lookup_field = 'isbn'
 
 
+class CustomBookDetail(BookDetail):
+    def get_object(self):
+        return Book.objects.get(isbn=self.kwargs['isbn'])
+
+
+class BulkBookCreate(generics.BulkCreateEndpoint):
+    model = Book
+    fields = ('title', 'isbn', 'price', 'author', 'publisher')
+    form_class = BookForm
+
+
+class BulkBookUpdate(generics.BulkUpdateEndpoint):
+    model = Book
+    fields = ('title', 'isbn', 'price')
+    lookup_field = 'isbn'
+
+
+class BulkArticleUpdate(generics.BulkUpdateEndpoint):
+    model = Article
+    fields = ('id', 'title')
+
+
+class BulkArticleDelete(generics.BulkDeleteEndpoint):
+    model = Article
+
+
+class BulkBookDelete(generics.BulkDeleteEndpoint):
+    model = Book
+    lookup_field = 'isbn'
+
+
+class CachedBookList(generics.ListEndpoint):
+    model = Book
+    fields = ('id', 'title', 'tags', ('author', {'fields': ['name']}))
+    response_cache_timeout = 60
+
+    def head(self, request, *args, **kwargs):
+        return HttpResponse()
+
+
+class ArticleList(generics.ListEndpoint):
+    model = Article
+    fields = ('id', 'title')
+    etag_field = 'version'
+    last_modified_field = 'updated'
+
+
+class NestedArticleList(generics.ListEndpoint):
+    model = Article
+    fields = ('id', 'title', ('author', {'fields': ['name']}))
+
+
+class VersionedArticleList(ArticleList):
+    last_modified_field = None
+
+
+class ArticleDetail(generics.DetailEndpoint):
+    model = Article
+    fields = ('id', 'title')
+    etag_field = 'version'
+    last_modified_field = 'updated'
+
+
 class FailsIntentionally(Endpoint):
     def get(self, request):
         raise Exception("I'm being a bad view")
@@ -86,3 +209,40 @@ class BasicAuthEndpoint(Endpoint):
     @login_required
     def get(self, request):
         return serialize(request.user)
+
+    @login_required
+    def post(self, request):
+        return {
+            'files': sorted(request.files),
+            'raw_data': request.raw_data,
+        }
+
+
+class AsyncAuthorList(generics.AsyncListCreateEndpoint):
+    model = Author
+    form_class = AuthorForm
+    lazy_streaming = True
+
+
+class AsyncAuthorDetail(generics.AsyncDetailUpdateDeleteEndpoint):
+    model = Author
+    form_class = AuthorForm
+    lookup_url_kwarg = 'author_id'
+
+
+class AsyncBasicAuthEndpoint(AsyncEndpoint):
+    authentication_classes = (BasicHttpAuth,)
+
+    @login_required
+    async def get(self, request):
+        return {'username': request.user.username}
+
+
+class AsyncStreamView(AsyncEndpoint):
+    streaming = True
+
+    async def get(self, request):
+        async def numbers():
+            for number in range(3):
+                yield {'number': number}
+        return {'data': numbers(), 'count': 3}